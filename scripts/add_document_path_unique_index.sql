@@ -0,0 +1,15 @@
+-- One-shot migration (SQLite): enforce one document per (project_id, path).
+-- Only needed for databases created before documents gained the unique idx_doc_proj_path;
+-- create_all does not add indexes to tables that already exist.
+-- Stop the server first, back up the file, then run e.g.:
+--   sqlite3 ./data/db/mcp_server.db < scripts/add_document_path_unique_index.sql
+--
+-- The index cannot be built while duplicates exist. List them with:
+--   SELECT project_id, path, group_concat(id) FROM documents GROUP BY project_id, path HAVING count(*) > 1;
+-- and rename or delete all but one document per pair, then rerun this script.
+
+BEGIN;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_doc_proj_path ON documents (project_id, path);
+
+COMMIT;
@@ -0,0 +1,55 @@
+-- One-shot migration (SQLite): tags keyed by name -> integer tag ids.
+-- Only needed for databases created before the tags table gained an integer id;
+-- new databases get the new schema from create_all on startup.
+-- Stop the server first, back up the file, then run e.g.:
+--   sqlite3 ./data/db/mcp_server.db < scripts/migrate_tags_to_integer_ids.sql
+
+PRAGMA foreign_keys=OFF;
+BEGIN;
+
+ALTER TABLE tags RENAME TO tags_old;
+ALTER TABLE document_tags RENAME TO document_tags_old;
+ALTER TABLE memory_entry_tags RENAME TO memory_entry_tags_old;
+
+CREATE TABLE tags (
+	id INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_tags_name ON tags (name);
+
+-- Include names only present in the association tables, in case tags was ever out of sync
+INSERT INTO tags (name)
+SELECT name FROM tags_old
+UNION SELECT tag_name FROM document_tags_old
+UNION SELECT tag_name FROM memory_entry_tags_old
+ORDER BY 1;
+
+CREATE TABLE document_tags (
+	document_id INTEGER NOT NULL,
+	tag_id INTEGER NOT NULL,
+	PRIMARY KEY (document_id, tag_id),
+	FOREIGN KEY(document_id) REFERENCES documents (id) ON DELETE CASCADE,
+	FOREIGN KEY(tag_id) REFERENCES tags (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_doc_tag_tagid ON document_tags (tag_id);
+INSERT INTO document_tags (document_id, tag_id)
+SELECT o.document_id, t.id FROM document_tags_old o JOIN tags t ON t.name = o.tag_name;
+
+CREATE TABLE memory_entry_tags (
+	memory_entry_id INTEGER NOT NULL,
+	tag_id INTEGER NOT NULL,
+	PRIMARY KEY (memory_entry_id, tag_id),
+	FOREIGN KEY(memory_entry_id) REFERENCES memory_entries (id) ON DELETE CASCADE,
+	FOREIGN KEY(tag_id) REFERENCES tags (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_mem_tag_tagid ON memory_entry_tags (tag_id);
+INSERT INTO memory_entry_tags (memory_entry_id, tag_id)
+SELECT o.memory_entry_id, t.id FROM memory_entry_tags_old o JOIN tags t ON t.name = o.tag_name;
+
+DROP TABLE document_tags_old;
+DROP TABLE memory_entry_tags_old;
+DROP TABLE tags_old;
+
+COMMIT;
+PRAGMA foreign_keys=ON;
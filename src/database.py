@@ -4,9 +4,9 @@ import logging
 from typing import AsyncGenerator # Use AsyncGenerator for dependency typing
 from fastapi import Request # Import Request for dependency injection
 
-# --- REMOVED create_async_engine, sessionmaker FROM HERE ---
-# --- They are now created dynamically in the lifespan manager ---
-from sqlalchemy.ext.asyncio import AsyncSession
+# --- Engine is built by create_db_engine(); the lifespan manager calls it and owns the session factory ---
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import event
 from sqlalchemy.engine import Engine # Keep for type hinting if needed elsewhere
@@ -18,8 +18,32 @@ logger = logging.getLogger(__name__)
 # --- REMOVED MODULE-LEVEL DEBUG LOG ---
 # logger.info(f"DATABASE_URL from settings: {settings.DATABASE_URL}")
 
-# --- REMOVED MODULE-LEVEL ENGINE CREATION ---
-# engine = create_async_engine(...)
+# --- Engine Factory ---
+# Called from the lifespan manager; no module-level engine is created at import time.
+def create_db_engine(database_url: str) -> AsyncEngine:
+    """
+    Creates the async engine with an explicitly sized AsyncAdaptedQueuePool.
+    In-memory SQLite keeps SQLAlchemy's default StaticPool (one shared connection),
+    since a queue of separate connections would each see an empty database.
+    """
+    # The aiosqlite and asyncpg dialects both declare supports_statement_cache=True, so this cache is live
+    engine_kwargs: dict = {"query_cache_size": settings.DB_QUERY_CACHE_SIZE}
+    if database_url.startswith("sqlite") and (":memory:" in database_url or database_url.rstrip("/").endswith(":")):
+        logger.info("Creating in-memory SQLite engine (default static pool).")
+    else:
+        engine_kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        if database_url.startswith("postgresql+asyncpg"):
+            # Keep idle pooled connections alive through NAT/load balancer timeouts
+            engine_kwargs["connect_args"] = {"server_settings": {"tcp_keepalives_idle": "30"}}
+        logger.info(f"Creating database engine with pool_size={settings.DB_POOL_SIZE}, max_overflow={settings.DB_MAX_OVERFLOW}, pool_recycle={settings.DB_POOL_RECYCLE}s, pool_timeout={settings.DB_POOL_TIMEOUT}s.")
+    return create_async_engine(database_url, **engine_kwargs)
 
 # Base class for declarative models - REMAINS HERE
 Base = declarative_base()
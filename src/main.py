@@ -6,11 +6,14 @@ import sys
 import uvicorn # Keep import
 import os
 from pathlib import Path
+from typing import Optional
 
 # --- FastAPI Imports ---
 from fastapi import FastAPI, Request # Keep Request for health check dependency
 from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
 # --- MCP / SSE Imports ---
 # Assume FastMCP handles SSE internally via sse_app()
@@ -57,8 +60,35 @@ logger.info(f"Project root determined as: {PROJECT_ROOT}")
 
 # --- Configure Templates ---
 templates_dir = PROJECT_ROOT / "src/templates"
-templates = Jinja2Templates(directory=str(templates_dir))
-logger.info(f"Templates configured from directory: {templates_dir}")
+# Preconfigured environment: bytecode cache survives restarts; file checks on every render only in development
+jinja_auto_reload = settings.ENVIRONMENT.lower() == "development"
+# Jinja unmarshals and executes whatever it finds in the cache directory, so it must not be writable by other users
+def _create_jinja_bytecode_cache(cache_dir: Optional[str]) -> FileSystemBytecodeCache:
+    """Per-user 0700 temp directory by default; a configured directory is created 0700 and must be ours."""
+    if not cache_dir: return FileSystemBytecodeCache() # Jinja creates and owner-checks its own per-user directory
+    path = Path(cache_dir)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = path.stat()
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{cache_dir} is owned by uid {st.st_uid}, not the server's uid {os.getuid()}")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"{cache_dir} is writable by group or others (mode {oct(st.st_mode & 0o777)})")
+    return FileSystemBytecodeCache(str(path))
+
+jinja_bytecode_cache = None
+try:
+    jinja_bytecode_cache = _create_jinja_bytecode_cache(settings.JINJA_BYTECODE_CACHE_DIR)
+except (OSError, RuntimeError) as e:
+    logger.warning(f"Jinja bytecode cache disabled, cannot use {settings.JINJA_BYTECODE_CACHE_DIR or 'the default per-user directory'}: {e}")
+jinja_env = Environment(
+    loader=FileSystemLoader(str(templates_dir)),
+    autoescape=True, # Same default Jinja2Templates applies to its own environment
+    auto_reload=jinja_auto_reload,
+    cache_size=settings.JINJA_CACHE_SIZE,
+    bytecode_cache=jinja_bytecode_cache,
+)
+templates = Jinja2Templates(env=jinja_env)
+logger.info(f"Templates configured from directory: {templates_dir} (auto_reload={jinja_auto_reload}, bytecode cache: {jinja_bytecode_cache.directory if jinja_bytecode_cache else 'off'})")
 
 # --- Create FastAPI App Instance at Top Level ---
 logger.info("Creating FastAPI application instance...")
@@ -73,6 +103,10 @@ logger.info("FastAPI application instance created with explicit lifespan.")
 
 # --- Configure FastAPI App Instance ---
 
+# Compress rendered UI pages; Starlette never gzips text/event-stream, so the MCP SSE stream passes through untouched
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+logger.info("GZip middleware added (minimum_size=1024).")
+
 # Store templates object in app state (accessible in dependencies/routes via request.app.state.templates)
 app.state.templates = templates
 logger.info("Templates attached to app state.")
@@ -97,6 +131,18 @@ else:
     logger.warning("Web UI router not imported, skipping inclusion.")
 
 
+# Add Health Check for FastAPI itself (Optional)
+# Registered before the root SSE mount below, which would otherwise shadow it
+@app.get("/_fastapi_health", tags=["Health"])
+async def health_check(request: Request):
+    logger.info("FastAPI health check requested")
+    engine = getattr(request.app.state, "db_engine", None)
+    # Pool status (checked-out vs. overflow connections) makes pool exhaustion visible
+    pool_status = engine.pool.status() if engine is not None else "unavailable"
+    return {"status": "ok", "message": "FastAPI wrapper is running", "db_pool": pool_status}
+logger.info("Health check endpoint '/_fastapi_health' added.")
+
+
 # Mount the FastMCP SSE App directly under / (root)
 try:
     sse_asgi_app = mcp_instance.sse_app()
@@ -117,13 +163,6 @@ except Exception as e:
     raise # Re-raise critical error
 
 
-# Add Health Check for FastAPI itself (Optional)
-@app.get("/_fastapi_health", tags=["Health"])
-async def health_check():
-    logger.info("FastAPI health check requested")
-    return {"status": "ok", "message": "FastAPI wrapper is running"}
-logger.info("Health check endpoint '/_fastapi_health' added.")
-
 logger.info("FastAPI application configuration complete. Ready for Uvicorn.")
 
 # --- Removed run_http_mode(), run_stdio_mode(), main_server_runner() ---
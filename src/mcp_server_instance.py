@@ -2,7 +2,8 @@
 # Defines the FastMCP server instance and its handlers.
 
 import logging, time
-from typing import Any, Dict, Optional, List, AsyncIterator
+from typing import Any, Dict, Iterable, Optional, List, AsyncIterator
+from itertools import islice
 from contextlib import asynccontextmanager
 import datetime
 
@@ -17,18 +18,20 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.orm import selectinload
-from sqlalchemy import event # Import event
+from sqlalchemy.orm import selectinload, joinedload, aliased
+from sqlalchemy import event, insert, update, delete, literal, exists, or_, case # Import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.engine import Engine # Import Engine
 
 # --- Database Imports ---
 # Import Base and the PRAGMA function directly
 # Remove engine, AsyncSessionFactory, get_db_session imports from here
-from .database import Base, _set_sqlite_pragma, logger as db_logger
+from .database import Base, _set_sqlite_pragma, create_db_engine, logger as db_logger
 
 # Import your models - **IMPORTANT**: Ensure models are loaded before create_all
 # You might need to explicitly import them if they aren't loaded elsewhere
-from .models import Project, Document, DocumentVersion, MemoryEntry, Tag, MemoryEntryRelation
+from .models import Project, Document, DocumentVersion, MemoryEntry, Tag, MemoryEntryRelation, document_tags_table, memory_entry_tags_table, memory_entry_document_relations_table
 
 # --- SDK Imports ---
 try:
@@ -45,8 +48,28 @@ from .config import settings
 logger = logging.getLogger(__name__)
 
 # --- Lifespan Management for Database ---
-# (@asynccontextmanager async def app_lifespan... function definition remains here)
-# ... (Keep the entire app_lifespan function as corrected previously) ...
+@asynccontextmanager
+async def app_lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    FastAPI lifespan: creates the pooled engine and session factory, ensures the
+    schema exists, and disposes of the engine (closing pooled connections) on shutdown.
+    """
+    # Validated once here so the web routes can use app.state.templates without per-request guards
+    if getattr(app.state, "templates", None) is None:
+        raise RuntimeError("Server configuration error: app.state.templates must be set before startup.")
+    logger.info("Lifespan: Initializing database engine...")
+    engine = create_db_engine(settings.DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        app.state.db_engine = engine
+        # expire_on_commit=False: routes read attributes (e.g. new IDs) after the transaction commits
+        app.state.db_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        logger.info("Lifespan: Database engine and session factory ready.")
+        yield
+    finally:
+        await engine.dispose()
+        logger.info("Lifespan: Database engine disposed.")
 
 
 
@@ -95,31 +118,41 @@ async def get_session_from_mcp_context(ctx: Context) -> AsyncSession:
 
 
 # --- DB Helper Functions ---
-# (Keep _get_or_create_tag, _create_project_in_db, _update_project_in_db, etc. as they are)
-# ... all existing DB helper functions (_get_or_create_tag, _create_project_in_db, ... _unlink_memory_entries) ...
-async def _get_or_create_tag(session: AsyncSession, tag_name: str) -> Tag:
-    """Helper function to get a Tag or create it if it doesn't exist."""
-    stmt = select(Tag).where(Tag.name == tag_name)
-    result = await session.execute(stmt)
-    tag = result.scalar_one_or_none()
-    if tag is None:
-        logger.info(f"Tag '{tag_name}' not found, creating...")
-        tag = Tag(name=tag_name)
-        session.add(tag)
-        try:
-            await session.flush()
-            await session.refresh(tag)
-            logger.info(f"Tag '{tag_name}' created or retrieved.")
-        except IntegrityError:
-            logger.warning(f"Tag '{tag_name}' likely created concurrently, retrieving existing.")
-            await session.rollback() # Rollback the failed add
-            stmt = select(Tag).where(Tag.name == tag_name)
-            result = await session.execute(stmt)
-            tag = result.scalar_one() # Should exist now
-        except SQLAlchemyError as e:
-            logger.error(f"Database error getting/creating tag '{tag_name}': {e}", exc_info=True)
-            raise
-    return tag
+# (Keep _create_project_in_db, _update_project_in_db, etc. as they are)
+# ... all existing DB helper functions (_insert_ignore, _execute_insert_ignore, _create_project_in_db, ... _unlink_memory_entries) ...
+# Tag writes go through INSERT ... ON CONFLICT DO NOTHING so "already tagged" is not a read-then-write.
+_INSERT_IGNORE_BY_DIALECT = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+def _insert_ignore(session: AsyncSession, table: Any):
+    """INSERT that skips rows conflicting with an existing key; run it with _execute_insert_ignore."""
+    dialect_insert = _INSERT_IGNORE_BY_DIALECT.get(session.get_bind().dialect.name)
+    return dialect_insert(table).on_conflict_do_nothing() if dialect_insert else insert(table)
+
+async def _execute_insert_ignore(session: AsyncSession, stmt: Any) -> int:
+    """Executes an _insert_ignore statement; returns the number of rows inserted (0 when it conflicted)."""
+    if session.get_bind().dialect.name in _INSERT_IGNORE_BY_DIALECT:
+        return (await session.execute(stmt)).rowcount
+    # Other dialects get a plain INSERT: a SAVEPOINT confines the conflict so the outer transaction carries on
+    try:
+        async with session.begin_nested():
+            return (await session.execute(stmt)).rowcount
+    except IntegrityError:
+        return 0
+
+def _tag_id_subquery(tag_name: str):
+    """Scalar subquery resolving a tag name to its id inside the calling statement."""
+    return select(Tag.id).where(Tag.name == tag_name).scalar_subquery()
+
+async def _add_tag_link_db(session: AsyncSession, owner_model: Any, link_table: Any, owner_column: str, owner_id: int, tag_name: str) -> bool:
+    """Upserts the tag and its association row; returns False only if the owning row does not exist."""
+    await _execute_insert_ignore(session, _insert_ignore(session, Tag).values(name=tag_name))
+    link_stmt = _insert_ignore(session, link_table).from_select(
+        [owner_column, "tag_id"],
+        select(owner_model.id, _tag_id_subquery(tag_name)).where(owner_model.id == owner_id)
+    )
+    if await _execute_insert_ignore(session, link_stmt): return True
+    # Nothing inserted: either already tagged or the owner is missing (FKs are not enforced under aiosqlite)
+    return bool((await session.execute(select(exists().where(owner_model.id == owner_id)))).scalar())
 
 async def _create_project_in_db(
     session: AsyncSession, name: str, path: str, description: Optional[str], is_active: bool
@@ -133,30 +166,51 @@ async def _create_project_in_db(
     logger.debug(f"Helper: Project created with ID {new_project.id}")
     return new_project
 
+async def _create_projects_bulk_in_db(
+    session: AsyncSession, rows: Iterable[Dict[str, Any]], batch_size: int = 500
+) -> List[int]:
+    """
+    Bulk-creates projects from an iterable of column dicts (name, path, description, is_active).
+    Rows are consumed in batches of batch_size, so memory stays O(batch_size) for any input size;
+    each batch is one executemany-style INSERT ... RETURNING (insertmanyvalues) instead of a flush per row.
+    Returns the new project IDs in input order.
+    """
+    rows_iter = iter(rows)
+    new_ids: List[int] = []
+    while batch := list(islice(rows_iter, batch_size)):
+        result = await session.execute(insert(Project).returning(Project.id, sort_by_parameter_order=True), batch)
+        new_ids.extend(result.scalars().all())
+        logger.debug(f"Helper: Bulk-inserted {len(batch)} projects ({len(new_ids)} so far).")
+    logger.info(f"Helper: Bulk-created {len(new_ids)} projects.")
+    return new_ids
+
 async def _update_project_in_db(
     session: AsyncSession, project_id: int, name: Optional[str] = None,
     description: Optional[str] = None, path: Optional[str] = None, is_active: Optional[bool] = None
 ) -> Project | None:
     """Core logic to update a project in the database."""
     logger.debug(f"Helper: Updating project ID {project_id} in DB.")
+    update_data = {key: value for key, value in {"name": name, "description": description, "path": path, "is_active": is_active}.items() if value is not None}
+    if update_data:
+        # Single UPDATE ... RETURNING; the WHERE skips the write (and the updated_at bump) when nothing changed
+        changed = or_(*(getattr(Project, key).is_distinct_from(value) for key, value in update_data.items()))
+        stmt = (
+            update(Project)
+            .where(Project.id == project_id, changed)
+            .values(**update_data, updated_at=datetime.datetime.utcnow())
+            .returning(Project)
+            .execution_options(populate_existing=True)
+        )
+        project = (await session.execute(stmt)).scalar_one_or_none()
+        if project is not None:
+            logger.debug(f"Helper: Applied updates to project {project_id}.")
+            return project
+    # No row updated: either nothing changed or the project does not exist
     project = await session.get(Project, project_id)
     if project is None:
         logger.warning(f"Helper: Project ID {project_id} not found for update.")
         return None
-    update_data = {"name": name, "description": description, "path": path, "is_active": is_active}
-    updated = False
-    for key, value in update_data.items():
-        if value is not None and getattr(project, key) != value:
-            setattr(project, key, value)
-            updated = True
-    if updated:
-        logger.debug(f"Helper: Applying updates to project {project_id}.")
-        # Ensure timestamp updates if your model relies on default= or onupdate=
-        project.updated_at = datetime.datetime.utcnow() # Manually set if not automatic
-        await session.flush()
-        await session.refresh(project)
-    else:
-        logger.debug(f"Helper: No changes detected for project {project_id}.")
+    logger.debug(f"Helper: No changes detected for project {project_id}.")
     return project
 
 # ... (rest of the helper functions remain unchanged) ...
@@ -176,51 +230,50 @@ async def _delete_project_in_db(session: AsyncSession, project_id: int) -> bool:
         logger.error(f"Helper: Database error deleting project {project_id}: {e}", exc_info=True)
         return False # Indicate failure
 
+_target_project = aliased(Project) # Correlation-free alias for the existence guard below
+
 async def _set_active_project_in_db(session: AsyncSession, project_id: int) -> Project | None:
     """Core logic to set a project as active, deactivating others."""
     logger.debug(f"Helper: Setting project ID {project_id} as active in DB.")
+    is_target = Project.id == project_id
+    # One UPDATE sets is_active = (id = target) for every row whose flag actually changes;
+    # the EXISTS guard keeps a missing target from deactivating everything.
+    stmt = (
+        update(Project)
+        .where(exists().where(_target_project.id == project_id), Project.is_active != is_target)
+        .values(is_active=case((is_target, True), else_=False), updated_at=datetime.datetime.utcnow())
+        .execution_options(synchronize_session="fetch")
+    )
+    result = await session.execute(stmt)
     project_to_activate = await session.get(Project, project_id)
     if project_to_activate is None:
         logger.warning(f"Helper: Project ID {project_id} not found to activate.")
         return None
-    # Deactivate others in a separate query for clarity/efficiency
-    stmt_deactivate = (
-        update(Project)
-        .where(Project.is_active == True, Project.id != project_id)
-        .values(is_active=False)
-    )
-    await session.execute(stmt_deactivate)
-
-    updated = False
-    if not project_to_activate.is_active:
-        logger.debug(f"Helper: Activating project ID: {project_id}")
-        project_to_activate.is_active = True
-        project_to_activate.updated_at = datetime.datetime.utcnow() # Manually set if needed
-        updated = True
-    else:
-         logger.debug(f"Helper: Project ID: {project_id} was already active.")
-
-    if updated:
-        await session.flush() # Flush changes to the single project if it was updated
-        await session.refresh(project_to_activate)
-    else:
-        logger.debug(f"Helper: No change in active state for project {project_id}.")
+    logger.debug(f"Helper: Active project set to {project_id} ({result.rowcount} row(s) changed).")
     return project_to_activate
 
 
+def _duplicate_document_path_message(path: str, project_id: int) -> str:
+    return f"A document with path '{path}' already exists in project {project_id}."
+
 async def _add_document_in_db(
     session: AsyncSession, project_id: int, name: str, path: str, content: str,
     type: str, version: str = "1.0.0"
 ) -> Document | None:
     """Core logic to add a document and its initial version."""
     logger.debug(f"Helper: Adding document '{name}' to project {project_id}.")
-    project = await session.get(Project, project_id)
-    if project is None:
+    # EXISTS probe: the project row itself is never loaded
+    if not (await session.execute(select(exists().where(Project.id == project_id)))).scalar():
         logger.warning(f"Helper: Project {project_id} not found for adding document.")
         return None
     new_document = Document(project_id=project_id, name=name, path=path, content=content, type=type, version=version)
     session.add(new_document)
-    await session.flush() # Get the new document ID
+    try:
+        await session.flush() # Get the new document ID
+    except IntegrityError:
+        # idx_doc_proj_path is the only unique key on documents besides the primary key
+        logger.warning(f"Helper: Document path '{path}' already exists in project {project_id}.")
+        raise ValueError(_duplicate_document_path_message(path, project_id)) from None
     new_version_entry = DocumentVersion(document_id=new_document.id, content=content, version=version)
     session.add(new_version_entry)
     # Flush again or rely on commit/outer flush
@@ -249,7 +302,12 @@ async def _update_document_in_db(
     if updated:
         logger.debug(f"Helper: Applying metadata updates to document {document_id}.")
         document.updated_at = datetime.datetime.utcnow() # Manually set if needed
-        await session.flush()
+        project_id = document.project_id # Read before the flush: a failed flush expires the instance
+        try:
+            await session.flush()
+        except IntegrityError:
+            logger.warning(f"Helper: Document path '{path}' already exists in project {project_id}.")
+            raise ValueError(_duplicate_document_path_message(path, project_id)) from None
         await session.refresh(document)
     else:
         logger.debug(f"Helper: No metadata changes detected for document {document_id}.")
@@ -331,19 +389,10 @@ async def _add_tag_to_document_db(session: AsyncSession, document_id: int, tag_n
     """Core logic to add a tag to a document."""
     logger.debug(f"Helper: Adding tag '{tag_name}' to document ID {document_id} in DB.")
     try:
-        stmt = select(Document).options(selectinload(Document.tags)).where(Document.id == document_id)
-        result = await session.execute(stmt)
-        document = result.scalar_one_or_none()
-        if document is None:
+        if not await _add_tag_link_db(session, Document, document_tags_table, "document_id", document_id, tag_name):
             logger.warning(f"Helper: Document {document_id} not found for adding tag '{tag_name}'.")
             return False
-        tag = await _get_or_create_tag(session, tag_name)
-        if tag not in document.tags:
-            document.tags.append(tag) # Use append for lists
-            await session.flush()
-            logger.info(f"Helper: Tag '{tag_name}' added to document {document_id}.")
-        else:
-            logger.info(f"Helper: Tag '{tag_name}' already exists on document {document_id}.")
+        logger.info(f"Helper: Tag '{tag_name}' added to (or already on) document {document_id}.")
         return True
     except SQLAlchemyError as e:
         logger.error(f"Helper: Database error adding tag '{tag_name}' to document {document_id}: {e}", exc_info=True)
@@ -356,25 +405,10 @@ async def _remove_tag_from_document_db(session: AsyncSession, document_id: int,
     """Core logic to remove a tag from a document."""
     logger.debug(f"Helper: Removing tag '{tag_name}' from document ID {document_id} in DB.")
     try:
-        stmt = select(Document).options(selectinload(Document.tags)).where(Document.id == document_id)
+        stmt = delete(document_tags_table).where(document_tags_table.c.document_id == document_id, document_tags_table.c.tag_id == _tag_id_subquery(tag_name))
         result = await session.execute(stmt)
-        document = result.scalar_one_or_none()
-        if document is None:
-            logger.warning(f"Helper: Document {document_id} not found for removing tag '{tag_name}'.")
-            return True # Success if doc not found
-        tag_to_remove = None
-        for tag in document.tags:
-            if tag.name == tag_name:
-                tag_to_remove = tag
-                break
-        if tag_to_remove:
-            document.tags.remove(tag_to_remove)
-            await session.flush()
-            logger.info(f"Helper: Tag '{tag_name}' removed from document {document_id}.")
-            return True
-        else:
-            logger.info(f"Helper: Tag '{tag_name}' was not found on document {document_id}.")
-            return True # Success if tag not found
+        logger.info(f"Helper: Tag '{tag_name}' {'removed from' if result.rowcount else 'was not found on'} document {document_id}.")
+        return True # Success whether or not the tag (or document) existed
     except SQLAlchemyError as e:
         logger.error(f"Helper: Database error removing tag '{tag_name}' from document {document_id}: {e}", exc_info=True)
         return False
@@ -417,18 +451,19 @@ async def _get_memory_entry_db(session: AsyncSession, entry_id: int) -> MemoryEn
     """
     Core logic to get a specific memory entry by its ID.
     Eagerly loads relationships needed for detail view.
+    Related documents/entries only load the columns callers display (no content).
     """
     logger.debug(f"Helper: Getting memory entry ID {entry_id} with relationships from DB.")
     try:
         stmt = select(MemoryEntry).options(
-            selectinload(MemoryEntry.project),
+            joinedload(MemoryEntry.project), # Many-to-one: rides along in the entry's own SELECT
             selectinload(MemoryEntry.tags),
-            selectinload(MemoryEntry.documents),
+            selectinload(MemoryEntry.documents).load_only(Document.id, Document.name),
             selectinload(MemoryEntry.target_relations).options(
-                selectinload(MemoryEntryRelation.source_entry)
+                selectinload(MemoryEntryRelation.source_entry).load_only(MemoryEntry.id, MemoryEntry.title)
             ),
             selectinload(MemoryEntry.source_relations).options(
-                selectinload(MemoryEntryRelation.target_entry)
+                selectinload(MemoryEntryRelation.target_entry).load_only(MemoryEntry.id, MemoryEntry.title)
             )
         ).where(MemoryEntry.id == entry_id)
 
@@ -452,27 +487,23 @@ async def _get_memory_entry_db(session: AsyncSession, entry_id: int) -> MemoryEn
 async def _add_memory_entry_db(
     session: AsyncSession, project_id: int, title: str, type: str, content: str
 ) -> MemoryEntry | None:
-    """Core logic to add a memory entry to the database."""
+    """
+    Core logic to add a memory entry to the database.
+    Validates the project and inserts in one statement (INSERT ... SELECT ... WHERE EXISTS ... RETURNING).
+    Returns None only when the project does not exist; database errors propagate to the caller.
+    """
     logger.debug(f"Helper: Adding memory entry '{title}' (type: {type}) to project {project_id}.")
-    try:
-        project = await session.get(Project, project_id)
-        if project is None:
-            logger.warning(f"Helper: Project {project_id} not found for adding memory entry.")
-            return None
-        new_entry = MemoryEntry(
-            project_id=project_id, title=title, type=type, content=content
-        )
-        session.add(new_entry)
-        await session.flush()
-        await session.refresh(new_entry)
-        logger.info(f"Helper: Memory entry '{title}' (ID: {new_entry.id}) added to project {project_id}.")
-        return new_entry
-    except SQLAlchemyError as e:
-        logger.error(f"Helper: Database error adding memory entry to project {project_id}: {e}", exc_info=True)
-        return None
-    except Exception as e:
-        logger.error(f"Helper: Unexpected error adding memory entry to project {project_id}: {e}", exc_info=True)
+    values = select(
+        literal(project_id, MemoryEntry.project_id.type), literal(type, MemoryEntry.type.type),
+        literal(title, MemoryEntry.title.type), literal(content, MemoryEntry.content.type)
+    ).where(exists().where(Project.id == project_id))
+    stmt = insert(MemoryEntry).from_select(["project_id", "type", "title", "content"], values).returning(MemoryEntry)
+    new_entry = (await session.execute(stmt)).scalar_one_or_none()
+    if new_entry is None:
+        logger.warning(f"Helper: Project {project_id} not found for adding memory entry.")
         return None
+    logger.info(f"Helper: Memory entry '{title}' (ID: {new_entry.id}) added to project {project_id}.")
+    return new_entry
 
 async def _update_memory_entry_db(
     session: AsyncSession, entry_id: int, title: Optional[str] = None,
@@ -481,26 +512,29 @@ async def _update_memory_entry_db(
     """Core logic to update a memory entry's fields in the database."""
     logger.debug(f"Helper: Updating memory entry ID {entry_id} in DB.")
     try:
+        update_data = {key: value for key, value in {"title": title, "type": type, "content": content}.items() if value is not None}
+        entry = None
+        if update_data:
+            # Single UPDATE ... RETURNING; the WHERE skips the write (and the updated_at bump) when nothing changed
+            changed = or_(*(getattr(MemoryEntry, key).is_distinct_from(value) for key, value in update_data.items()))
+            stmt = (
+                update(MemoryEntry)
+                .where(MemoryEntry.id == entry_id, changed)
+                .values(**update_data, updated_at=datetime.datetime.utcnow())
+                .returning(MemoryEntry)
+                .execution_options(populate_existing=True)
+            )
+            entry = (await session.execute(stmt)).scalar_one_or_none()
+        if entry is not None:
+            logger.debug(f"Helper: Applied updates to memory entry {entry_id}.")
+            return entry
+
+        # No row updated: either nothing changed or the entry does not exist
         entry = await session.get(MemoryEntry, entry_id)
         if entry is None:
             logger.warning(f"Helper: MemoryEntry ID {entry_id} not found for update.")
             return None
-
-        update_data = {"title": title, "type": type, "content": content}
-        updated = False
-        for key, value in update_data.items():
-            if value is not None and getattr(entry, key) != value:
-                setattr(entry, key, value)
-                updated = True
-
-        if updated:
-            logger.debug(f"Helper: Applying updates to memory entry {entry_id}.")
-            entry.updated_at = datetime.datetime.utcnow() # Manually set if needed
-            await session.flush()
-            await session.refresh(entry)
-        else:
-            logger.debug(f"Helper: No changes detected for memory entry {entry_id}.")
-
+        logger.debug(f"Helper: No changes detected for memory entry {entry_id}.")
         return entry
     except SQLAlchemyError as e:
         logger.error(f"Helper: Database error updating memory entry {entry_id}: {e}", exc_info=True)
@@ -537,19 +571,10 @@ async def _add_tag_to_memory_entry_db(session: AsyncSession, entry_id: int, tag_
     """Core logic to add a tag to a memory entry."""
     logger.debug(f"Helper: Adding tag '{tag_name}' to memory entry ID {entry_id}.")
     try:
-        stmt = select(MemoryEntry).options(selectinload(MemoryEntry.tags)).where(MemoryEntry.id == entry_id)
-        result = await session.execute(stmt)
-        entry = result.scalar_one_or_none()
-        if entry is None:
+        if not await _add_tag_link_db(session, MemoryEntry, memory_entry_tags_table, "memory_entry_id", entry_id, tag_name):
             logger.warning(f"Helper: MemoryEntry {entry_id} not found for adding tag '{tag_name}'.")
             return False
-        tag = await _get_or_create_tag(session, tag_name)
-        if tag not in entry.tags:
-            entry.tags.append(tag) # Use append
-            await session.flush()
-            logger.info(f"Helper: Tag '{tag_name}' added to memory entry {entry_id}.")
-        else:
-            logger.info(f"Helper: Tag '{tag_name}' already exists on memory entry {entry_id}.")
+        logger.info(f"Helper: Tag '{tag_name}' added to (or already on) memory entry {entry_id}.")
         return True
     except SQLAlchemyError as e:
         logger.error(f"Helper: DB error adding tag '{tag_name}' to memory {entry_id}: {e}", exc_info=True)
@@ -562,25 +587,10 @@ async def _remove_tag_from_memory_entry_db(session: AsyncSession, entry_id: int,
     """Core logic to remove a tag from a memory entry."""
     logger.debug(f"Helper: Removing tag '{tag_name}' from memory entry ID {entry_id}.")
     try:
-        stmt = select(MemoryEntry).options(selectinload(MemoryEntry.tags)).where(MemoryEntry.id == entry_id)
+        stmt = delete(memory_entry_tags_table).where(memory_entry_tags_table.c.memory_entry_id == entry_id, memory_entry_tags_table.c.tag_id == _tag_id_subquery(tag_name))
         result = await session.execute(stmt)
-        entry = result.scalar_one_or_none()
-        if entry is None:
-            logger.warning(f"Helper: MemoryEntry {entry_id} not found for removing tag '{tag_name}'.")
-            return True # Success if entry not found
-        tag_to_remove = None
-        for tag in entry.tags:
-            if tag.name == tag_name:
-                tag_to_remove = tag
-                break
-        if tag_to_remove:
-            entry.tags.remove(tag_to_remove)
-            await session.flush()
-            logger.info(f"Helper: Tag '{tag_name}' removed from memory entry {entry_id}.")
-            return True
-        else:
-            logger.info(f"Helper: Tag '{tag_name}' not found on memory entry {entry_id}.")
-            return True # Success if tag not found
+        logger.info(f"Helper: Tag '{tag_name}' {'removed from' if result.rowcount else 'not found on'} memory entry {entry_id}.")
+        return True # Success whether or not the tag (or entry) existed
     except SQLAlchemyError as e:
         logger.error(f"Helper: DB error removing tag '{tag_name}' from memory {entry_id}: {e}", exc_info=True)
         return False
@@ -588,6 +598,33 @@ async def _remove_tag_from_memory_entry_db(session: AsyncSession, entry_id: int,
         logger.error(f"Helper: Unexpected error removing tag '{tag_name}' from memory {entry_id}: {e}", exc_info=True)
         return False
 
+async def _link_memory_to_document_db(session: AsyncSession, entry_id: int, document_id: int) -> Optional[bool]:
+    """
+    Links a document to a memory entry with one INSERT ... ON CONFLICT DO NOTHING on the association table.
+    Returns True if the link was created, False if it already existed, None if the entry or the document does not exist.
+    """
+    logger.debug(f"Helper: Linking document {document_id} to memory entry {entry_id}.")
+    # Both endpoints are checked inside the INSERT itself (FKs are not enforced under aiosqlite)
+    entry_exists = exists().where(MemoryEntry.id == entry_id)
+    document_exists = exists().where(Document.id == document_id)
+    link_stmt = _insert_ignore(session, memory_entry_document_relations_table).from_select(
+        ["memory_entry_id", "document_id"],
+        select(literal(entry_id), literal(document_id)).where(entry_exists, document_exists)
+    )
+    if await _execute_insert_ignore(session, link_stmt): return True
+    # Nothing inserted: either already linked or an endpoint is missing
+    both_exist = (await session.execute(select(entry_exists & document_exists))).scalar()
+    return False if both_exist else None
+
+async def _unlink_memory_from_document_db(session: AsyncSession, entry_id: int, document_id: int) -> bool:
+    """Deletes the memory entry <-> document link row directly; returns True if a link was removed."""
+    logger.debug(f"Helper: Unlinking document {document_id} from memory entry {entry_id}.")
+    stmt = delete(memory_entry_document_relations_table).where(
+        memory_entry_document_relations_table.c.memory_entry_id == entry_id,
+        memory_entry_document_relations_table.c.document_id == document_id
+    )
+    return bool((await session.execute(stmt)).rowcount)
+
 # --- Define MCP Tools using Decorators ---
 # IMPORTANT: These tools now need to get the session using the FastAPI dependency system
 # or the potentially unreliable get_session_from_mcp_context helper.
@@ -670,6 +707,10 @@ async def update_project(
 ) -> Dict[str, Any]:
     logger.info(f"Handling update_project MCP tool request for ID: {project_id}")
     if not ctx: logger.error("Context (ctx) argument missing in update_project call."); return {"error": "Internal server error: Context missing."}
+    # Nothing to change: skip the write transaction and just return the current state
+    if all(x is None for x in (name, description, path, is_active)):
+        logger.info(f"MCP Tool: No fields supplied for project {project_id}, returning current state.")
+        return await get_project(project_id, ctx)
     try:
         async with await get_session_from_mcp_context(ctx) as session:
             async with session.begin():
@@ -749,6 +790,7 @@ async def add_document(
                  "updated_at": added_document.updated_at.isoformat() if added_document.updated_at else None,
             }
         }
+    except ValueError as ve: logger.warning(f"MCP Tool: Could not add document to project {project_id}: {ve}"); return {"error": str(ve)}
     except SQLAlchemyError as e: logger.error(f"Database error adding document to project {project_id} via MCP tool: {e}", exc_info=True); return {"error": f"Database error: {e}"}
     except Exception as e: logger.error(f"Unexpected error adding document to project {project_id} via MCP tool: {e}", exc_info=True); return {"error": f"Unexpected server error: {e}"}
 
@@ -942,12 +984,7 @@ async def add_memory_entry(
         async with await get_session_from_mcp_context(ctx) as session:
             async with session.begin():
                 new_entry = await _add_memory_entry_db(session, project_id, title, type, content)
-                if new_entry is None:
-                     # Check if project exists using the same session before raising
-                     project = await session.get(Project, project_id)
-                     error_msg = f"Project with ID {project_id} not found" if project is None else "Database error adding memory entry"
-                     logger.warning(f"MCP Tool: {error_msg}") if project is None else logger.error(f"MCP Tool: {error_msg}")
-                     raise ValueError(error_msg)
+                if new_entry is None: error_msg = f"Project with ID {project_id} not found"; logger.warning(f"MCP Tool: {error_msg}"); raise ValueError(error_msg)
         logger.info(f"MCP Tool: Memory entry '{title}' (ID: {new_entry.id}) added successfully.")
         return {
             "message": "Memory entry added successfully",
@@ -1135,14 +1172,12 @@ async def link_memory_entry_to_document(memory_entry_id: int, document_id: int,
     try:
         async with await get_session_from_mcp_context(ctx) as session:
             async with session.begin():
-                entry_stmt = select(MemoryEntry).options(selectinload(MemoryEntry.documents)).where(MemoryEntry.id == memory_entry_id)
-                entry_res = await session.execute(entry_stmt)
-                entry = entry_res.scalar_one_or_none()
-                document = await session.get(Document, document_id)
-                if entry is None: return {"error": f"MemoryEntry {memory_entry_id} not found"}
-                if document is None: return {"error": f"Document {document_id} not found"}
-                if document in entry.documents: logger.info(f"Document {document_id} is already linked to MemoryEntry {memory_entry_id}."); message = "Link already exists"
-                else: entry.documents.append(document); logger.info(f"Linked Document {document_id} to MemoryEntry {memory_entry_id}."); message = f"Linked document {document_id} to memory entry {memory_entry_id}"
+                linked = await _link_memory_to_document_db(session, memory_entry_id, document_id)
+                if linked is None:
+                    entry_found = (await session.execute(select(exists().where(MemoryEntry.id == memory_entry_id)))).scalar()
+                    return {"error": f"MemoryEntry {memory_entry_id} not found"} if not entry_found else {"error": f"Document {document_id} not found"}
+                if not linked: logger.info(f"Document {document_id} is already linked to MemoryEntry {memory_entry_id}."); message = "Link already exists"
+                else: logger.info(f"Linked Document {document_id} to MemoryEntry {memory_entry_id}."); message = f"Linked document {document_id} to memory entry {memory_entry_id}"
         return {"message": message}
     except SQLAlchemyError as e: logger.error(f"Database error linking memory entry {memory_entry_id} to doc {document_id}: {e}", exc_info=True); return {"error": f"Database error: {e}"}
     except Exception as e: logger.error(f"Unexpected error linking memory entry {memory_entry_id} to doc {document_id}: {e}", exc_info=True); return {"error": f"Unexpected server error: {e}"}
@@ -1229,14 +1264,8 @@ async def unlink_memory_entry_from_document(memory_entry_id: int, document_id: i
     try:
         async with await get_session_from_mcp_context(ctx) as session:
             async with session.begin():
-                stmt = select(MemoryEntry).options(selectinload(MemoryEntry.documents)).where(MemoryEntry.id == memory_entry_id)
-                result = await session.execute(stmt)
-                entry = result.scalar_one_or_none()
-                if entry is None: logger.warning(f"MemoryEntry {memory_entry_id} not found for unlinking document."); return {"error": f"MemoryEntry {memory_entry_id} not found"}
-                document_to_remove = None
-                for doc in entry.documents:
-                    if doc.id == document_id: document_to_remove = doc; break
-                if document_to_remove: entry.documents.remove(document_to_remove); logger.info(f"Unlinked Document {document_id} from MemoryEntry {memory_entry_id}."); message = f"Unlinked document {document_id} from memory entry {memory_entry_id}"
+                if await _unlink_memory_from_document_db(session, memory_entry_id, document_id): logger.info(f"Unlinked Document {document_id} from MemoryEntry {memory_entry_id}."); message = f"Unlinked document {document_id} from memory entry {memory_entry_id}"
+                elif not (await session.execute(select(exists().where(MemoryEntry.id == memory_entry_id)))).scalar(): logger.warning(f"MemoryEntry {memory_entry_id} not found for unlinking document."); return {"error": f"MemoryEntry {memory_entry_id} not found"}
                 else: logger.warning(f"Link between MemoryEntry {memory_entry_id} and Document {document_id} not found."); message = "Link not found"
         return {"message": message}
     except SQLAlchemyError as e: logger.error(f"Database error unlinking memory entry {memory_entry_id} from doc {document_id}: {e}", exc_info=True); return {"error": f"Database error: {e}"}
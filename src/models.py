@@ -2,9 +2,11 @@
 # Defines SQLAlchemy ORM models based on schema.ts.txt
 
 import datetime
+import zlib
 from sqlalchemy import (
-    Table, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, PrimaryKeyConstraint
+    Table, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, PrimaryKeyConstraint, LargeBinary, text
 )
+from sqlalchemy.types import TypeDecorator
 # Need relationship, Mapped, mapped_column, selectinload for eager loading if needed
 from sqlalchemy.orm import relationship, Mapped, mapped_column, selectinload
 from sqlalchemy.sql import func
@@ -14,24 +16,53 @@ from typing import List, Optional, Set
 # Import the Base class from database.py
 from .database import Base
 
+# --- Column Types ---
+class CompressedText(TypeDecorator):
+    """Text stored as a blob: one marker byte, then raw UTF-8 or zlib-compressed UTF-8 for long values.
+
+    Rows written before the switch come back from SQLite as plain str and are returned unchanged.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    MIN_COMPRESS_BYTES = 512
+    _RAW, _ZLIB = b"\x00", b"\x01"
+
+    def process_bind_param(self, value, dialect):
+        if value is None: return None
+        data = value.encode("utf-8")
+        if len(data) >= self.MIN_COMPRESS_BYTES:
+            packed = zlib.compress(data, 6)
+            if len(packed) < len(data): return self._ZLIB + packed
+        return self._RAW + data
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str): return value
+        value = bytes(value)
+        if value[:1] == self._ZLIB: return zlib.decompress(value[1:]).decode("utf-8")
+        if value[:1] == self._RAW: return value[1:].decode("utf-8")
+        return value.decode("utf-8") # Unmarked blob (should not happen)
+
 # --- Association Tables ---
 
 # Define association table for Document <-> Tag (Many-to-Many)
 document_tags_table = Table(
     "document_tags",
     Base.metadata,
-    # Ensure column names match the original schema if necessary
-    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True),
-    Column("tag_name", Text, ForeignKey("tags.name", ondelete="CASCADE"), primary_key=True) # Link to Tag.name
+    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False), # Link to Tag.id
+    PrimaryKeyConstraint("document_id", "tag_id"),
+    Index("ix_doc_tag_tagid", "tag_id") # Reverse lookup: tag -> documents
 )
 
 # Define association table for MemoryEntry <-> Tag (Many-to-Many)
 memory_entry_tags_table = Table(
     "memory_entry_tags",
     Base.metadata,
-    # Ensure column names match the original schema if necessary
-    Column("memory_entry_id", Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), primary_key=True),
-    Column("tag_name", Text, ForeignKey("tags.name", ondelete="CASCADE"), primary_key=True) # Link to Tag.name
+    Column("memory_entry_id", Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), nullable=False),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False), # Link to Tag.id
+    PrimaryKeyConstraint("memory_entry_id", "tag_id"),
+    Index("ix_mem_tag_tagid", "tag_id") # Reverse lookup: tag -> memory entries
 )
 
 # Define association table for MemoryEntry <-> Document (Many-to-Many) - This should already be here
@@ -48,23 +79,26 @@ memory_entry_document_relations_table = Table(
 # --- ADD Tag Model ---
 class Tag(Base):
     __tablename__ = "tags"
-    # Simple tag model - just the name acts as the primary key
-    name: Mapped[str] = mapped_column(Text, primary_key=True)
+    # Integer surrogate key keeps association rows and their indexes small; the name stays unique
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(Text, nullable=False, unique=True, index=True)
 
     # Define relationships back to Documents and MemoryEntries using the association tables
     documents: Mapped[List["Document"]] = relationship(
         "Document",
         secondary=document_tags_table,
-        back_populates="tags"
+        back_populates="tags",
+        lazy="raise_on_sql" # Never walked from the tag side
     )
     memory_entries: Mapped[List["MemoryEntry"]] = relationship(
         "MemoryEntry",
         secondary=memory_entry_tags_table,
-        back_populates="tags"
+        back_populates="tags",
+        lazy="raise_on_sql" # Never walked from the tag side
     )
 
     def __repr__(self):
-        return f"<Tag(name='{self.name}')>"
+        return f"<Tag(id={self.id}, name='{self.name}')>"
 
 
 
@@ -76,12 +110,13 @@ class Project(Base):
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     path: Mapped[str] = mapped_column(Text, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, index=True) # Assuming INTEGER 0/1 maps to Boolean
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"), onupdate=func.now())
 
-    # Relationships
-    documents: Mapped[List["Document"]] = relationship("Document", back_populates="project", cascade="all, delete-orphan")
-    memory_entries: Mapped[List["MemoryEntry"]] = relationship("MemoryEntry", back_populates="project", cascade="all, delete-orphan")
+    # Relationships: potentially large collections stay lazy="select"; query sites opt in with selectinload()
+    documents: Mapped[List["Document"]] = relationship("Document", back_populates="project", cascade="all, delete-orphan", lazy="select")
+    # Most recently updated first, sorted by the database when the collection loads
+    memory_entries: Mapped[List["MemoryEntry"]] = relationship("MemoryEntry", back_populates="project", cascade="all, delete-orphan", lazy="select", order_by="(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc())")
 
     def __repr__(self):
         return f"<Project(id={self.id}, name='{self.name}')>"
@@ -91,33 +126,38 @@ class Document(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     project_id: Mapped[int] = mapped_column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
-    type: Mapped[str] = mapped_column(Text, nullable=False, index=True)
-    name: Mapped[str] = mapped_column(Text, nullable=False, index=True)
+    type: Mapped[str] = mapped_column(Text, nullable=False) # Indexed via idx_doc_proj_type_name
+    name: Mapped[str] = mapped_column(Text, nullable=False) # Indexed via idx_doc_proj_type_name
     path: Mapped[str] = mapped_column(Text, nullable=False, index=True)
-    content: Mapped[str] = mapped_column(Text, nullable=False) # Consider LargeBinary if content is not text
+    content: Mapped[str] = mapped_column(CompressedText, nullable=False)
     version: Mapped[str] = mapped_column(Text, nullable=False, default="1.0.0")
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"), onupdate=func.now())
 
-    # Relationships
-    project: Mapped["Project"] = relationship("Project", back_populates="documents")
-    versions: Mapped[List["DocumentVersion"]] = relationship("DocumentVersion", back_populates="document", cascade="all, delete-orphan", order_by="DocumentVersion.created_at")
+    # Relationships raise instead of lazy loading; callers must eager-load what they use (selectinload etc.)
+    project: Mapped["Project"] = relationship("Project", back_populates="documents", lazy="raise_on_sql")
+    versions: Mapped[List["DocumentVersion"]] = relationship("DocumentVersion", back_populates="document", cascade="all, delete-orphan", order_by="DocumentVersion.created_at", lazy="raise_on_sql")
     # --- ADD BACK tags relationship, linking to Tag via document_tags_table ---
     tags: Mapped[Set["Tag"]] = relationship(
         "Tag",
         secondary=document_tags_table,
         back_populates="documents",
-        collection_class=set # Use a set for tags
-        # Consider adding lazy='selectin' if you often need tags when loading documents
+        collection_class=set, # Use a set for tags
+        lazy="raise_on_sql"
     )
     memory_entries: Mapped[List["MemoryEntry"]] = relationship(
         "MemoryEntry",
         secondary=memory_entry_document_relations_table,
-        back_populates="documents"
+        back_populates="documents",
+        lazy="raise_on_sql"
     )
 
-    # Add __table_args__ for multi-column indexes if needed, e.g. for unique constraints
-    # __table_args__ = (Index('idx_doc_proj_path', 'project_id', 'path', unique=True),)
+    # Composite indexes serve per-project listings (project_id prefix) without extra single-column indexes
+    __table_args__ = (
+        Index("idx_doc_proj_type_name", "project_id", "type", "name"),
+        Index("idx_doc_proj_path", "project_id", "path", unique=True), # A path identifies one document per project
+        Index("idx_doc_proj_name", "project_id", "name"), # Per-project lists ordered by name (link candidates, documents list)
+    )
 
     def __repr__(self):
         return f"<Document(id={self.id}, name='{self.name}', project_id={self.project_id})>"
@@ -130,10 +170,10 @@ class DocumentVersion(Base):
     document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     version: Mapped[str] = mapped_column(Text, nullable=False, index=True)
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
 
     # Relationship
-    document: Mapped["Document"] = relationship("Document", back_populates="versions")
+    document: Mapped["Document"] = relationship("Document", back_populates="versions", lazy="raise_on_sql")
 
     def __repr__(self):
         return f"<DocumentVersion(id={self.id}, version='{self.version}', document_id={self.document_id})>"
@@ -144,39 +184,51 @@ class MemoryEntry(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     project_id: Mapped[int] = mapped_column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
-    type: Mapped[str] = mapped_column(Text, nullable=False, index=True)
-    title: Mapped[str] = mapped_column(Text, nullable=False, index=True)
-    content: Mapped[str] = mapped_column(Text, nullable=False)
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
-
-    # Relationships
-    project: Mapped["Project"] = relationship("Project", back_populates="memory_entries")
+    type: Mapped[str] = mapped_column(Text, nullable=False) # Indexed via idx_mem_proj_type_title
+    title: Mapped[str] = mapped_column(Text, nullable=False) # Indexed via idx_mem_project_title
+    content: Mapped[str] = mapped_column(CompressedText, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"), onupdate=func.now())
+
+    # Relationships raise instead of lazy loading; callers must eager-load what they use (selectinload etc.)
+    project: Mapped["Project"] = relationship("Project", back_populates="memory_entries", lazy="raise_on_sql")
     # --- ADD BACK tags relationship, linking to Tag via memory_entry_tags_table ---
     tags: Mapped[Set["Tag"]] = relationship(
         "Tag",
         secondary=memory_entry_tags_table,
         back_populates="memory_entries",
-        collection_class=set # Use a set for tags
-        # Consider adding lazy='selectin' if you often need tags when loading memory entries
+        collection_class=set, # Use a set for tags
+        lazy="raise_on_sql"
     )
     documents: Mapped[List["Document"]] = relationship(
         "Document",
         secondary=memory_entry_document_relations_table,
-        back_populates="memory_entries"
+        back_populates="memory_entries",
+        lazy="raise_on_sql"
     )
     # Relationships for self-referencing MemoryEntryRelation table
     source_relations: Mapped[List["MemoryEntryRelation"]] = relationship(
         "MemoryEntryRelation",
         foreign_keys="MemoryEntryRelation.source_memory_entry_id",
         back_populates="source_entry",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql"
     )
     target_relations: Mapped[List["MemoryEntryRelation"]] = relationship(
         "MemoryEntryRelation",
         foreign_keys="MemoryEntryRelation.target_memory_entry_id",
         back_populates="target_entry",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql"
+    )
+
+    # Composite/ordering indexes for the hot queries: sibling entries of a project ordered by title,
+    # and the global list ordered by updated_at DESC (SQLite/Postgres scan the index backwards)
+    __table_args__ = (
+        Index("idx_mem_project_title", "project_id", "title"),
+        Index("idx_mem_proj_type_title", "project_id", "type", "title"),
+        Index("idx_mem_updated_desc", "updated_at", "id"), # Covers the (updated_at DESC, id DESC) list order, tie-breaker included
+        Index("idx_mem_proj_updated", "project_id", "updated_at", "id"), # Project detail: one project's entries, newest first
     )
 
     def __repr__(self):
@@ -190,27 +242,16 @@ class MemoryEntryRelation(Base):
     source_memory_entry_id: Mapped[int] = mapped_column(Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), nullable=False)
     target_memory_entry_id: Mapped[int] = mapped_column(Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), nullable=False)
     relation_type: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"), onupdate=func.now())
 
     # Relationships back to MemoryEntry
-    source_entry: Mapped["MemoryEntry"] = relationship("MemoryEntry", foreign_keys=[source_memory_entry_id], back_populates="source_relations")
-    target_entry: Mapped["MemoryEntry"] = relationship("MemoryEntry", foreign_keys=[target_memory_entry_id], back_populates="target_relations")
+    source_entry: Mapped["MemoryEntry"] = relationship("MemoryEntry", foreign_keys=[source_memory_entry_id], back_populates="source_relations", lazy="raise_on_sql")
+    target_entry: Mapped["MemoryEntry"] = relationship("MemoryEntry", foreign_keys=[target_memory_entry_id], back_populates="target_relations", lazy="raise_on_sql")
 
-    # Add indexes if needed from original schema (not explicitly shown, but likely useful)
-    # __table_args__ = (Index('idx_mem_relation_source', 'source_memory_entry_id'),
-    #                   Index('idx_mem_relation_target', 'target_memory_entry_id'),)
+    # Relations are always looked up from one side or the other
+    __table_args__ = (Index('idx_mem_relation_source', 'source_memory_entry_id'),
+                      Index('idx_mem_relation_target', 'target_memory_entry_id'),)
 
     def __repr__(self):
          return f"<MemoryEntryRelation(id={self.id}, source={self.source_memory_entry_id}, target={self.target_memory_entry_id})>"
-
-# --- Optional: Tag Model ---
-# If you want to manage tags as their own table instead of just strings in association tables:
-# class Tag(Base):
-#     __tablename__ = "tags" # Or reuse document_tags/memory_entry_tags if combined
-#     name: Mapped[str] = mapped_column(Text, primary_key=True)
-#     documents: Mapped[List["Document"]] = relationship(secondary=document_tags_table, back_populates="tags")
-#     memory_entries: Mapped[List["MemoryEntry"]] = relationship(secondary=memory_entry_tags_table, back_populates="tags")
-#
-#     def __repr__(self):
-#         return f"<Tag(name='{self.name}')>"
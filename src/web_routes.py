@@ -1,18 +1,27 @@
 # src/web_routes.py
 
+import asyncio
 import logging
+import hashlib
+import secrets
+import time
 # import httpx # Commented out as likely unused now
-from typing import Any, Dict, Optional
-from fastapi import APIRouter, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from fastapi import APIRouter, Request, Depends, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.templating import Jinja2Templates
+from starlette.datastructures import URL
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy.sql import func # Needed for counts
-from .database import get_db_session, AsyncSessionFactory # Import factory for checks
-from .models import Document, Project, MemoryEntry, DocumentVersion, MemoryEntryRelation # Added MemoryEntryRelation
+from sqlalchemy import Integer, exists, delete
+from sqlalchemy.orm import selectinload, joinedload, load_only, raiseload, aliased
+from sqlalchemy.sql import func, bindparam # Needed for counts / reusable statements
+from .database import get_db_session
+from .models import Document, Project, MemoryEntry, DocumentVersion, MemoryEntryRelation, Tag, memory_entry_tags_table, memory_entry_document_relations_table
 from sqlalchemy.exc import SQLAlchemyError
-from urllib.parse import quote_plus
 
 # --- Import all necessary DB helpers ---
 from .mcp_server_instance import (
@@ -23,15 +32,13 @@ from .mcp_server_instance import (
     _remove_tag_from_document_db,
     _get_document_version_content_db,
     _add_document_version_db, # Added in Phase 5
-    _get_memory_entry_db,
     _add_memory_entry_db,
     _update_memory_entry_db,
     _delete_memory_entry_db,
     _add_tag_to_memory_entry_db,
-    _remove_tag_from_memory_entry_db
-    # TODO: Add/confirm imports for link/unlink helpers if they exist, otherwise use direct logic below
-    # link_memory_entry_to_document, # Example if helper exists
-    # unlink_memory_entry_from_document, # Example if helper exists
+    _remove_tag_from_memory_entry_db,
+    _link_memory_to_document_db,
+    _unlink_memory_from_document_db
 )
 
 
@@ -42,14 +49,229 @@ from .config import settings
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# --- Pagination ---
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _pagination_context(page: int, page_size: int, total: int) -> Dict[str, Any]:
+    """Builds the pagination metadata passed to list templates."""
+    total_pages = max(1, -(-total // page_size))
+    return {"page": page, "page_size": page_size, "total": total, "total_pages": total_pages, "has_prev": page > 1, "has_next": page < total_pages}
+
+# --- Conditional GET (ETag) ---
+LIST_CACHE_CONTROL = "private, max-age=5"
+
+def _make_etag(*parts: Any) -> str:
+    """Builds a quoted ETag from values that change whenever the rendered page would."""
+    digest = hashlib.sha1(repr((settings.VERSION,) + parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+# --- Template Object Cache ---
+# Compiled Template objects keyed by (environment, name). Skipped while the environment auto-reloads
+# (development), so template edits still show up; otherwise a hit is one dict lookup, no loader call.
+_template_cache: Dict[tuple, Any] = {}
+
+def _get_template(templates: Jinja2Templates, template_name: str) -> Any:
+    """Returns the compiled template, looked up through the Jinja environment at most once in production."""
+    env = templates.env
+    if env.auto_reload: return env.get_template(template_name)
+    key = (env, template_name)
+    template = _template_cache.get(key)
+    if template is None: template = _template_cache[key] = env.get_template(template_name)
+    return template
+
+def _render(templates: Jinja2Templates, template_name: str, context: Dict[str, Any]) -> HTMLResponse:
+    """Renders a cached template straight to an HTMLResponse."""
+    return HTMLResponse(_get_template(templates, template_name).render(context))
+
+# --- Streamed List Rendering ---
+# Random per process so it can never collide with user-supplied text (e.g. an ?error= banner)
+ROWS_MARKER = f"__rows_{secrets.token_hex(8)}__"
+STREAM_CHUNK_ROWS = 100
+
+async def _stream_rows(request: Request, stmt: Any, row_template_name: str, row_name: str, head: str, tail: str) -> AsyncIterator[str]:
+    """
+    Yields the page head, then rows rendered chunk by chunk from a server-side cursor, then the tail.
+    Uses its own session: the request's dependency session may be closed once streaming starts.
+    """
+    row_template = _get_template(request.app.state.templates, row_template_name)
+    yield head
+    try:
+        async with request.app.state.db_session_factory() as session:
+            result = await session.stream_scalars(stmt.execution_options(yield_per=STREAM_CHUNK_ROWS))
+            async for chunk in result.partitions():
+                yield "".join(row_template.render({"request": request, row_name: row}) for row in chunk)
+    except SQLAlchemyError as e:
+        # Headers are already sent; close the page cleanly and log
+        logger.error(f"Database error while streaming rows for {row_template_name}: {e}", exc_info=True)
+    yield tail
+
+# --- Threadpool Rendering (large pages) ---
+async def _render_in_threadpool(templates: Jinja2Templates, template_name: str, context: Dict[str, Any]) -> HTMLResponse:
+    """Renders a template on the worker thread pool so long lists don't block the event loop."""
+    # Context objects must be fully loaded: a lazy load from the worker thread cannot reach the async session
+    html = await run_in_threadpool(_get_template(templates, template_name).render, context)
+    return HTMLResponse(html)
+
+# --- Rendered HTML Cache (static forms) ---
+# Forms whose output depends only on route params are rendered once per (template, base URL, key).
+# Entries remember the Template object they came from, so a Jinja auto-reload re-renders them.
+RENDERED_HTML_CACHE_SIZE = 1024
+_rendered_html_cache: "OrderedDict[tuple, tuple[Any, str]]" = OrderedDict()
+
+def _render_cached(request: Request, template_name: str, cache_key: tuple, build_context: Callable[[], Dict[str, Any]]) -> HTMLResponse:
+    """Returns cached HTML for a parameter-only page, rendering (and caching) it on a miss."""
+    template = _get_template(request.app.state.templates, template_name)
+    key = (template_name, str(request.base_url), cache_key)
+    cached = _rendered_html_cache.get(key)
+    if cached is not None and cached[0] is template:
+        _rendered_html_cache.move_to_end(key)
+        return HTMLResponse(cached[1])
+    html = template.render({"request": request, "data": build_context()})
+    _rendered_html_cache[key] = (template, html)
+    if len(_rendered_html_cache) > RENDERED_HTML_CACHE_SIZE: _rendered_html_cache.popitem(last=False)
+    return HTMLResponse(html)
+
+# --- Cached Route URLs ---
+# Route patterns are resolved once per (app, route, base URL); later lookups are a plain str.format.
+_URL_PARAM_SENTINEL = 918273645546372819
+
+@lru_cache(maxsize=256)
+def _route_url_template(app: Any, route_name: str, base_url: str, param_names: tuple) -> str:
+    """Resolves a route to an absolute URL format string, e.g. 'http://host/ui/memory/{entry_id}'."""
+    sentinels = {name: _URL_PARAM_SENTINEL + i for i, name in enumerate(param_names)}
+    url = str(app.url_path_for(route_name, **sentinels).make_absolute_url(base_url))
+    url = url.replace("{", "{{").replace("}", "}}")
+    for name, value in sentinels.items(): url = url.replace(str(value), "{" + name + "}")
+    return url
+
+def _fast_url_for(request: Request, route_name: str, **path_params: Any) -> str:
+    """Equivalent of request.url_for() that skips the router walk after the first call."""
+    return _route_url_template(request.app, route_name, str(request.base_url), tuple(path_params)).format(**path_params)
+
+def _view_memory_url(request: Request, entry_id: int) -> str:
+    return _fast_url_for(request, 'ui_view_memory_entry', entry_id=entry_id)
+
+# --- Templates Dependency ---
+def get_templates(request: Request) -> Jinja2Templates:
+    """Dependency returning the app's Jinja2Templates (presence is validated once in app_lifespan)."""
+    return request.app.state.templates
+
+# --- Error Redirects ---
+@lru_cache(maxsize=256)
+def _error_url(url: str, error_message: str) -> str:
+    """Encodes ?error=<message> into url once per (url, message); recurring errors skip the re-encode."""
+    return str(URL(url).include_query_params(error=error_message))
+
+def _redirect_with_error(url: Any, error_message: str, status_code: int = 303) -> RedirectResponse:
+    """Redirects to url with ?error=<message>, merged into any query string it already has."""
+    return RedirectResponse(_error_url(str(url), error_message), status_code=status_code)
+
+# --- Existence Probe ---
+async def _row_exists(db: AsyncSession, model: Any, row_id: int) -> bool:
+    """Cheap primary-key existence check on the request's own session (no ORM object load)."""
+    return bool((await db.execute(select(exists().where(model.id == row_id)))).scalar())
+
+# --- Reusable Statements ---
+# Built once at import so every request reuses the same statement (and compiled-cache entry).
+# One round trip for the dashboard: each COUNT(*) is a scalar subquery of a single SELECT
+_DASHBOARD_COUNTS_STMT = select(
+    select(func.count()).select_from(Project).scalar_subquery().label("projects"),
+    select(func.count()).select_from(Document).scalar_subquery().label("documents"),
+    select(func.count()).select_from(MemoryEntry).scalar_subquery().label("memory_entries")
+)
+# Plain column rows (no ORM instances / identity map) holding exactly what projects.html shows
+_LIST_PROJECTS_STMT = (
+    select(Project.id, Project.name, Project.description, Project.path, Project.is_active, Project.updated_at)
+    .order_by(Project.name, Project.id)
+)
+_COUNT_PROJECTS_STMT = select(func.count(Project.id))
+# Scalar-only project views: any relationship access raises instead of lazy loading
+_PROJECT_SCALAR_OPTIONS = (raiseload("*"),)
+# Project detail lists, queried alongside the project itself; only the columns project_detail.html shows
+_PROJECT_DOCUMENTS_STMT = (
+    select(Document).options(load_only(Document.id, Document.name, Document.type, Document.version, Document.updated_at))
+    .where(Document.project_id == bindparam("project_id", type_=Integer)).order_by(Document.id)
+)
+_PROJECT_MEMORY_ENTRIES_STMT = (
+    select(MemoryEntry).options(load_only(MemoryEntry.id, MemoryEntry.title, MemoryEntry.type, MemoryEntry.updated_at))
+    .where(MemoryEntry.project_id == bindparam("project_id", type_=Integer))
+    .order_by(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc())
+)
+# Lookups by id bind through an explicitly typed bindparam, so one compiled form serves every id
+_GET_DOCUMENT_DETAIL_STMT = (
+    select(Document)
+    # Version history shows metadata only; a version's content is loaded on its own page
+    .options(selectinload(Document.tags), selectinload(Document.versions).load_only(DocumentVersion.id, DocumentVersion.version, DocumentVersion.created_at))
+    .where(Document.id == bindparam("doc_id", type_=Integer))
+)
+_GET_MEMORY_ENTRY_FORM_STMT = (
+    select(MemoryEntry)
+    .options(load_only(MemoryEntry.id, MemoryEntry.title, MemoryEntry.type, MemoryEntry.content, MemoryEntry.project_id))
+    .where(MemoryEntry.id == bindparam("entry_id", type_=Integer))
+)
+# Only the columns documents_list.html shows (never content); the many-to-one project joins in the same query
+_LIST_DOCUMENTS_STMT = (
+    select(Document)
+    .options(
+        load_only(Document.id, Document.project_id, Document.name, Document.type, Document.version, Document.updated_at),
+        joinedload(Document.project).load_only(Project.id, Project.name)
+    )
+    .order_by(Document.project_id, Document.name, Document.id)
+)
+_COUNT_DOCUMENTS_STMT = select(func.count()).select_from(Document)
+# Cheap change signature for the memory list: any insert/edit/delete of an entry (or rename of a project) alters it
+_MEMORY_LIST_SIGNATURE_STMT = select(func.count(MemoryEntry.id), func.max(MemoryEntry.updated_at), select(func.max(Project.updated_at)).scalar_subquery())
+# Paged per request with .limit()/.offset(), which bind their values and keep the cache key stable
+_LIST_MEMORY_ENTRIES_STMT = (
+    select(MemoryEntry).options(joinedload(MemoryEntry.project).load_only(Project.id, Project.name))
+    .order_by(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc())
+)
+# Link candidates on the memory detail page. The entry's project is resolved in SQL (via an alias, so the
+# memory-entry query doesn't correlate it away), letting these run alongside the entry load itself
+_entry_for_project = aliased(MemoryEntry)
+_ENTRY_PROJECT_ID = (
+    select(_entry_for_project.project_id).where(_entry_for_project.id == bindparam("entry_id", type_=Integer)).scalar_subquery()
+)
+_LINKABLE_DOCUMENTS_STMT = (
+    select(Document).options(load_only(Document.id, Document.name))
+    .where(Document.project_id == _ENTRY_PROJECT_ID).order_by(Document.name)
+)
+_LINKABLE_MEMORY_ENTRIES_STMT = (
+    select(MemoryEntry).options(load_only(MemoryEntry.id, MemoryEntry.title))
+    .where(MemoryEntry.project_id == _ENTRY_PROJECT_ID, MemoryEntry.id != bindparam("entry_id", type_=Integer))
+    .order_by(MemoryEntry.title)
+)
+
+# --- Dashboard Counts Cache ---
+# Per process; the dashboard tolerates counts this many seconds stale.
+DASHBOARD_COUNTS_TTL = 5.0
+_dashboard_counts_cache: Optional[tuple[float, tuple[int, int, int]]] = None
+# Concurrent misses wait for the one refresh in flight instead of each querying
+_dashboard_counts_lock = asyncio.Lock()
+
+def _fresh_dashboard_counts() -> Optional[tuple[int, int, int]]:
+    cached = _dashboard_counts_cache
+    if cached is not None and time.monotonic() - cached[0] < DASHBOARD_COUNTS_TTL: return cached[1]
+    return None
+
+async def _get_dashboard_counts(db: AsyncSession) -> tuple[int, int, int]:
+    """Returns (projects, documents, memory entries) counts, querying at most once per TTL."""
+    global _dashboard_counts_cache
+    counts = _fresh_dashboard_counts()
+    if counts is not None: return counts
+    async with _dashboard_counts_lock:
+        counts = _fresh_dashboard_counts()  # Another request may have refreshed while we waited
+        if counts is not None: return counts
+        counts = tuple((await db.execute(_DASHBOARD_COUNTS_STMT)).one())
+        _dashboard_counts_cache = (time.monotonic(), counts)
+    return counts
+
 # --- Root Route (Dashboard) ---
 @router.get("/", response_class=HTMLResponse, name="ui_root")
 async def ui_root(request: Request, db: AsyncSession = Depends(get_db_session)):
     """Serves the main dashboard/index page of the UI with entity counts."""
-    logger.info("Web UI root requested")
     templates = request.app.state.templates
-    if not templates:
-        raise HTTPException(status_code=500, detail="Server configuration error")
 
     project_count: int | str = 0
     document_count: int | str = 0
@@ -57,16 +279,9 @@ async def ui_root(request: Request, db: AsyncSession = Depends(get_db_session)):
     error_message = None
 
     try:
-        project_count_result = await db.execute(select(func.count(Project.id)))
-        project_count = project_count_result.scalar_one_or_none() or 0
-
-        document_count_result = await db.execute(select(func.count(Document.id)))
-        document_count = document_count_result.scalar_one_or_none() or 0
-
-        memory_entry_count_result = await db.execute(select(func.count(MemoryEntry.id)))
-        memory_entry_count = memory_entry_count_result.scalar_one_or_none() or 0
-
-        logger.info(f"Dashboard counts: Projects={project_count}, Docs={document_count}, Memory={memory_entry_count}")
+        project_count, document_count, memory_entry_count = await _get_dashboard_counts(db)
+        # One record per dashboard hit
+        logger.info("Web UI root requested: Projects=%s, Docs=%s, Memory=%s", project_count, document_count, memory_entry_count)
 
     except Exception as e:
         logger.error(f"Failed to fetch counts for dashboard: {e}", exc_info=True)
@@ -90,49 +305,54 @@ async def ui_root(request: Request, db: AsyncSession = Depends(get_db_session)):
 
 # --- Project Routes ---
 @router.get("/projects", response_class=HTMLResponse, name="ui_list_projects")
-async def list_projects_web(request: Request, db: AsyncSession = Depends(get_db_session)):
-    """Fetches projects from DB and renders the projects list page."""
-    logger.info("Web UI projects list requested")
+async def list_projects_web(
+    request: Request, page: int = Query(1, ge=1), page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Fetches one page of projects from DB and renders the projects list page."""
+    logger.info("Web UI projects list requested (page %s, size %s)", page, page_size)
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
     projects = []
+    total = 0
     error_message = None
     try:
-        stmt = select(Project).order_by(Project.name)
-        result = await db.execute(stmt)
-        projects = result.scalars().all()
+        total = (await db.execute(_COUNT_PROJECTS_STMT)).scalar_one()
+        # LIMIT/OFFSET are bound parameters, so every page shares one compiled statement
+        result = await db.execute(_LIST_PROJECTS_STMT.limit(page_size).offset((page - 1) * page_size))
+        projects = result.all()
     except Exception as e:
         logger.error(f"Failed to fetch projects for web UI: {e}", exc_info=True)
         error_message = f"Error fetching projects: {e}"
-    context_data = {"page_title": "Projects List", "projects": projects, "error": error_message}
+    context_data = {"page_title": "Projects List", "projects": projects, "pagination": _pagination_context(page, page_size, total), "error": error_message}
     return templates.TemplateResponse("projects.html", {"request": request, "data": context_data})
 
 @router.get("/projects/new", response_class=HTMLResponse, name="ui_new_project")
 async def new_project_form(request: Request):
     """Displays the form to create a new project."""
     logger.info("Web UI new project form requested")
-    templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    context_data = {
-        "page_title": "Create New Project",
-        "form_action": request.url_for('ui_create_project'),
-        "error": request.query_params.get("error"),
-        "cancel_url": request.url_for('ui_list_projects')
-    }
-    return templates.TemplateResponse("project_form.html", {"request": request, "data": context_data})
+    error_message = request.query_params.get("error")
+    def build_context() -> Dict[str, Any]:
+        return {
+            "page_title": "Create New Project",
+            "form_action": _fast_url_for(request, 'ui_create_project'),
+            "error": error_message,
+            "cancel_url": _fast_url_for(request, 'ui_list_projects')
+        }
+    # Without an error the form is fully static, so serve it from the rendered HTML cache
+    if not error_message: return _render_cached(request, "project_form.html", (), build_context)
+    return request.app.state.templates.TemplateResponse("project_form.html", {"request": request, "data": build_context()})
 
 @router.get("/projects/{project_id}/edit", response_class=HTMLResponse, name="ui_edit_project")
 async def edit_project_form(project_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Displays the form pre-filled for editing an existing project."""
-    logger.info(f"Web UI edit project form requested for ID: {project_id}")
+    logger.info("Web UI edit project form requested for ID: %s", project_id)
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    project = await db.get(Project, project_id)
+    project = await db.get(Project, project_id, options=_PROJECT_SCALAR_OPTIONS)
     if project is None: raise HTTPException(status_code=404, detail=f"Project with ID {project_id} not found")
     context_data = {
         "page_title": f"Edit Project: {project.name}",
-        "form_action": request.url_for('ui_update_project', project_id=project_id),
-        "cancel_url": request.url_for('ui_view_project', project_id=project_id),
+        "form_action": _fast_url_for(request, 'ui_update_project', project_id=project_id),
+        "cancel_url": _fast_url_for(request, 'ui_view_project', project_id=project_id),
         "error": request.query_params.get("error"),
         "project": project,
         "is_edit_mode": True
@@ -145,7 +365,7 @@ async def create_project_web(
     name: str = Form(...), path: str = Form(...), description: Optional[str] = Form(None), is_active: bool = Form(False)
 ):
     """Handles the submission of the new project form."""
-    logger.info(f"Web UI create_project form submitted: name='{name}'")
+    logger.info("Web UI create_project form submitted: name='%s'", name)
     error_message = None
     new_project_id = None
     created_project = None
@@ -154,33 +374,40 @@ async def create_project_web(
              created_project = await _create_project_in_db(
                  session=db, name=name, path=path, description=description if description else None, is_active=is_active
              )
-        if created_project: new_project_id = created_project.id; logger.info(f"Project created directly via web route, ID: {new_project_id}")
+        if created_project: new_project_id = created_project.id; logger.info("Project created directly via web route, ID: %s", new_project_id)
     except SQLAlchemyError as e: error_message = f"Database error creating project: {e}"; logger.error(f"Database error creating project via web route: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Unexpected error in create_project_web: {e}", exc_info=True)
-    if new_project_id is not None: return RedirectResponse(request.url_for('ui_view_project', project_id=new_project_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error')}"; return RedirectResponse(str(request.url_for('ui_new_project')) + error_param, status_code=303)
+    if new_project_id is not None: return RedirectResponse(_fast_url_for(request, 'ui_view_project', project_id=new_project_id), status_code=303)
+    # Error path only: the message is encoded here, never on success
+    return _redirect_with_error(_fast_url_for(request, 'ui_new_project'), error_message or 'Unknown error')
 
 @router.get("/projects/{project_id}", response_class=HTMLResponse, name="ui_view_project")
-async def view_project_web(project_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
+async def view_project_web(
+    project_id: int, request: Request, db: AsyncSession = Depends(get_db_session),
+    documents_db: AsyncSession = Depends(get_db_session, use_cache=False), # Extra sessions so the three queries can overlap
+    memory_db: AsyncSession = Depends(get_db_session, use_cache=False)
+):
     """Fetches a specific project AND its related items, renders its detail page."""
-    logger.info(f"Web UI project detail requested for ID: {project_id}")
+    logger.info("Web UI project detail requested for ID: %s", project_id)
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    project = None
+    project = None; documents = []; memory_entries = []
     error_message = request.query_params.get("error")
     try:
-        stmt = select(Project).options(selectinload(Project.documents), selectinload(Project.memory_entries)).where(Project.id == project_id)
-        result = await db.execute(stmt)
-        project = result.scalar_one_or_none()
+        # Project (primary-key get) and both lists are independent, so their round trips run concurrently
+        params = {"project_id": project_id}
+        project, doc_results, mem_results = await asyncio.gather(
+            db.get(Project, project_id, options=_PROJECT_SCALAR_OPTIONS),
+            documents_db.execute(_PROJECT_DOCUMENTS_STMT, params),
+            memory_db.execute(_PROJECT_MEMORY_ENTRIES_STMT, params)
+        )
         if project is None: error_message = f"Project with ID {project_id} not found."; logger.warning(error_message); raise HTTPException(status_code=404, detail=error_message)
-        else:
-            if project.memory_entries: project.memory_entries.sort(key=lambda me: me.updated_at, reverse=True)
-            logger.info(f"Found project '{project.name}' with {len(project.documents)} documents and {len(project.memory_entries)} memory entries for detail view.")
+        documents = doc_results.scalars().all(); memory_entries = mem_results.scalars().all()
+        logger.info("Found project '%s' with %s documents and %s memory entries for detail view.", project.name, len(documents), len(memory_entries))
     except SQLAlchemyError as e: error_message = error_message or f"Database error fetching project details: {e}"; logger.error(f"Database error fetching project {project_id} for web UI: {e}", exc_info=True); raise HTTPException(status_code=500, detail=error_message)
     except HTTPException: raise
     except Exception as e: error_message = error_message or f"An unexpected server error occurred: {e}"; logger.error(f"Unexpected error fetching project {project_id} for web UI: {e}", exc_info=True); raise HTTPException(status_code=500, detail=error_message)
-    context_data = {"page_title": f"Project: {project.name}" if project else "Project Not Found", "project": project, "error": error_message}
-    return templates.TemplateResponse("project_detail.html", {"request": request, "data": context_data})
+    context_data = {"page_title": f"Project: {project.name}" if project else "Project Not Found", "project": project, "documents": documents, "memory_entries": memory_entries, "error": error_message}
+    return await _render_in_threadpool(templates, "project_detail.html", {"request": request, "data": context_data})
 
 @router.post("/projects/{project_id}/edit", name="ui_update_project")
 async def update_project_web(
@@ -188,81 +415,80 @@ async def update_project_web(
     name: str = Form(...), path: str = Form(...), description: Optional[str] = Form(None), is_active: bool = Form(False)
 ):
     """Handles the submission of the edit project form."""
-    logger.info(f"Web UI update_project form submitted for ID: {project_id}")
+    logger.info("Web UI update_project form submitted for ID: %s", project_id)
     error_message = None
     updated_project = None
     try:
         async with db.begin():
              updated_project = await _update_project_in_db(session=db, project_id=project_id, name=name, path=path, description=description if description else None, is_active=is_active)
-        if updated_project is None: error_message = f"Project with ID {project_id} not found."; logger.warning(f"Update failed via web route: {error_message}")
-        else: logger.info(f"Project {project_id} updated successfully via web route.")
+        if updated_project is None: error_message = f"Project with ID {project_id} not found."; logger.warning("Update failed via web route: %s", error_message)
+        else: logger.info("Project %s updated successfully via web route.", project_id)
     except SQLAlchemyError as e: error_message = f"Database error updating project: {e}"; logger.error(f"Database error updating project {project_id} via web route: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Unexpected error in update_project_web for ID {project_id}: {e}", exc_info=True)
-    if updated_project is not None and error_message is None: return RedirectResponse(request.url_for('ui_view_project', project_id=project_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error during update.')}"; return RedirectResponse(str(request.url_for('ui_edit_project', project_id=project_id)) + error_param, status_code=303)
+    if updated_project is not None and error_message is None: return RedirectResponse(_fast_url_for(request, 'ui_view_project', project_id=project_id), status_code=303)
+    return _redirect_with_error(_fast_url_for(request, 'ui_edit_project', project_id=project_id), error_message or 'Unknown error during update.')
 
 @router.post("/projects/{project_id}/delete", name="ui_delete_project")
 async def delete_project_web(project_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Handles the deletion of a project."""
-    logger.info(f"Web UI delete_project form submitted for ID: {project_id}")
+    logger.info("Web UI delete_project form submitted for ID: %s", project_id)
     error_message = None
     try:
-        async with db.begin():
-            deleted = await _delete_project_in_db(session=db, project_id=project_id)
-            if not deleted: error_message = f"Failed to delete project {project_id} (DB error)."; logger.error(f"{error_message} (Helper returned False)"); raise SQLAlchemyError(error_message)
-        logger.info(f"Project {project_id} deleted successfully via web route.")
-    except SQLAlchemyError as e: error_message = error_message or f"Database error deleting project {project_id}: {e}"; logger.error(error_message, exc_info=True)
-    except Exception as e: error_message = f"Error deleting project {project_id}: {e}"; logger.error(error_message, exc_info=True)
-    redirect_url = request.url_for('ui_list_projects')
-    if error_message: logger.info(f"Redirecting to project list with error indication for project {project_id}") # redirect_url += f"?error={quote_plus(error_message)}"
-    return RedirectResponse(redirect_url, status_code=303)
+        deleted = await _delete_project_in_db(session=db, project_id=project_id)
+        if deleted: await db.commit(); logger.info("Project %s deleted successfully via web route.", project_id)
+        else: await db.rollback(); error_message = f"Failed to delete project {project_id} (DB error)."; logger.error(f"{error_message} (Helper returned False)")
+    except SQLAlchemyError as e: await db.rollback(); error_message = f"Database error deleting project {project_id}: {e}"; logger.error(error_message, exc_info=True)
+    except Exception as e: await db.rollback(); error_message = f"Error deleting project {project_id}: {e}"; logger.error(error_message, exc_info=True)
+    if error_message: logger.info("Redirecting to project list with error indication for project %s", project_id) # The list page does not show ?error= banners
+    return RedirectResponse(_fast_url_for(request, 'ui_list_projects'), status_code=303)
 
 @router.post("/projects/{project_id}/activate", name="ui_activate_project")
 async def activate_project_web(project_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Handles setting a project as active."""
-    logger.info(f"Web UI activate_project request for ID: {project_id}")
+    logger.info("Web UI activate_project request for ID: %s", project_id)
     error_message = None
     try:
         async with db.begin():
             activated_project = await _set_active_project_in_db(session=db, project_id=project_id)
             if activated_project is None: error_message = f"Project {project_id} not found to activate."; logger.warning(error_message); raise ValueError(error_message)
-        logger.info(f"Project {project_id} activated successfully via web route.")
+        logger.info("Project %s activated successfully via web route.", project_id)
     except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error activating project {project_id}: {e}"; logger.error(error_message, exc_info=True)
     except Exception as e: error_message = f"Unexpected error activating project {project_id}: {e}"; logger.error(error_message, exc_info=True)
-    redirect_url = request.url_for('ui_list_projects')
-    if error_message: logger.info(f"Redirecting to project list with error indication for project {project_id}") # redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _fast_url_for(request, 'ui_list_projects')
+    if error_message: logger.info("Redirecting to project list with error indication for project %s", project_id) # The list page does not show ?error= banners
     return RedirectResponse(redirect_url, status_code=303)
 
 # --- Document Routes ---
 @router.get("/documents", response_class=HTMLResponse, name="ui_list_documents_all")
-async def list_all_documents_web(request: Request, db: AsyncSession = Depends(get_db_session)):
-    """Fetches ALL documents across projects and renders the documents list page."""
-    logger.info("Web UI list all documents requested")
+async def list_all_documents_web(
+    request: Request, page: int = Query(1, ge=1), page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Fetches one page of documents across projects and renders the documents list page."""
+    logger.info(f"Web UI list all documents requested (page {page}, size {page_size})")
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    documents = []
+    documents = []; total = 0
     error_message = request.query_params.get("error")
     try:
-        stmt = select(Document).options(selectinload(Document.project)).order_by(Document.project_id, Document.name)
-        result = await db.execute(stmt)
-        documents = result.scalars().all()
-        logger.info(f"Found {len(documents)} total documents.")
+        total = (await db.execute(_COUNT_DOCUMENTS_STMT)).scalar_one()
+        if total:
+            result = await db.execute(_LIST_DOCUMENTS_STMT.limit(page_size).offset((page - 1) * page_size))
+            documents = result.scalars().all()
+        logger.info(f"Showing {len(documents)} of {total} total documents.")
     except SQLAlchemyError as e: error_message = error_message or f"Database error fetching documents: {e}"; logger.error(f"Database error fetching all documents: {e}", exc_info=True)
     except Exception as e: error_message = error_message or f"Unexpected server error: {e}"; logger.error(f"Unexpected error fetching all documents: {e}", exc_info=True)
-    context_data = {"page_title": "All Documents", "documents": documents, "error": error_message}
-    return templates.TemplateResponse("documents_list.html", {"request": request, "data": context_data})
+    context_data = {"page_title": "All Documents", "documents": documents, "pagination": _pagination_context(page, page_size, total), "error": error_message}
+    return await _render_in_threadpool(templates, "documents_list.html", {"request": request, "data": context_data})
 
 @router.get("/documents/{doc_id}", response_class=HTMLResponse, name="ui_view_document")
 async def view_document_web(doc_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Fetches a specific document and its related items, renders its detail page."""
     logger.info(f"Web UI document detail requested for ID: {doc_id}")
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
     document = None
     error_message = request.query_params.get("error")
     try:
-        stmt = select(Document).options(selectinload(Document.tags), selectinload(Document.versions)).where(Document.id == doc_id)
-        result = await db.execute(stmt)
+        result = await db.execute(_GET_DOCUMENT_DETAIL_STMT, {"doc_id": doc_id})
         document = result.scalar_one_or_none()
         if document is None: error_message = f"Document with ID {doc_id} not found."; logger.warning(error_message); raise HTTPException(status_code=404, detail=error_message)
         else: logger.info(f"Found document '{document.name}' (ID: {doc_id})")
@@ -270,22 +496,24 @@ async def view_document_web(doc_id: int, request: Request, db: AsyncSession = De
     except HTTPException: raise
     except Exception as e: error_message = error_message or f"Unexpected server error: {e}"; logger.error(f"Unexpected error fetching document {doc_id}: {e}", exc_info=True); raise HTTPException(status_code=500, detail="Unexpected server error.")
     context_data = {"page_title": f"Document: {document.name}" if document else "Document Not Found", "document": document, "error": error_message}
-    return templates.TemplateResponse("document_detail.html", {"request": request, "data": context_data})
+    return await _render_in_threadpool(templates, "document_detail.html", {"request": request, "data": context_data})
 
 @router.get("/projects/{project_id}/documents/new", response_class=HTMLResponse, name="ui_new_document")
 async def new_document_form(project_id: int, request: Request):
     """Displays the form to create a new document for a specific project."""
     logger.info(f"Web UI new document form requested for project ID: {project_id}")
-    templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    context_data = {
-        "page_title": "Add New Document",
-        "form_action": request.url_for('ui_create_document', project_id=project_id),
-        "cancel_url": request.url_for('ui_view_project', project_id=project_id),
-        "project_id": project_id,
-        "error": request.query_params.get("error")
-    }
-    return templates.TemplateResponse("document_form.html", {"request": request, "data": context_data})
+    error_message = request.query_params.get("error")
+    def build_context() -> Dict[str, Any]:
+        return {
+            "page_title": "Add New Document",
+            "form_action": _fast_url_for(request, 'ui_create_document', project_id=project_id),
+            "cancel_url": _fast_url_for(request, 'ui_view_project', project_id=project_id),
+            "project_id": project_id,
+            "error": error_message
+        }
+    # The error-free form only varies by project_id, so serve it from the rendered HTML cache
+    if not error_message: return _render_cached(request, "document_form.html", (project_id,), build_context)
+    return request.app.state.templates.TemplateResponse("document_form.html", {"request": request, "data": build_context()})
 
 @router.post("/projects/{project_id}/documents", name="ui_create_document")
 async def create_document_web(
@@ -298,29 +526,26 @@ async def create_document_web(
     try:
         async with db.begin():
             added_document = await _add_document_in_db(session=db, project_id=project_id, name=name, path=path, content=content, type=type, version=version if version else "1.0.0")
-            if added_document is None:
-                async with AsyncSessionFactory() as check_session: project = await check_session.get(Project, project_id)
-                error_message = f"Project with ID {project_id} not found." if project is None else "Database error adding document."
-                logger.warning(f"Add document failed: {error_message}") if project is None else logger.error(f"Add document failed: {error_message}")
-                raise ValueError(error_message)
+            # The helper checks the project inside this transaction and returns None only when it is missing
+            if added_document is None: error_message = f"Project with ID {project_id} not found."; logger.warning(f"Add document failed: {error_message}"); raise ValueError(error_message)
         new_document_id = added_document.id; logger.info(f"Document created directly via web route, ID: {new_document_id}")
-    except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error adding document: {e}"; logger.error(f"Error in create_document_web for project {project_id}: {e}", exc_info=True)
+    except ValueError as e: error_message = error_message or str(e); logger.warning(f"Add document failed for project {project_id}: {e}")
+    except SQLAlchemyError as e: error_message = error_message or f"Error adding document: {e}"; logger.error(f"Error in create_document_web for project {project_id}: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error in create_document_web for project {project_id}: {e}", exc_info=True)
-    if new_document_id is not None: return RedirectResponse(request.url_for('ui_view_document', doc_id=new_document_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error adding document.')}"; return RedirectResponse(str(request.url_for('ui_new_document', project_id=project_id)) + error_param, status_code=303)
+    if new_document_id is not None: return RedirectResponse(_fast_url_for(request, 'ui_view_document', doc_id=new_document_id), status_code=303)
+    else: return _redirect_with_error(_fast_url_for(request, 'ui_new_document', project_id=project_id), error_message or 'Unknown error adding document.')
 
 @router.get("/documents/{doc_id}/edit", response_class=HTMLResponse, name="ui_edit_document")
 async def edit_document_form(doc_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Displays the form pre-filled for editing document metadata."""
     logger.info(f"Web UI edit document form requested for ID: {doc_id}")
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
     document = await db.get(Document, doc_id)
     if document is None: raise HTTPException(status_code=404, detail=f"Document with ID {doc_id} not found")
     context_data = {
         "page_title": f"Edit Document: {document.name}",
-        "form_action": request.url_for('ui_update_document', doc_id=doc_id),
-        "cancel_url": request.url_for('ui_view_document', doc_id=doc_id),
+        "form_action": _fast_url_for(request, 'ui_update_document', doc_id=doc_id),
+        "cancel_url": _fast_url_for(request, 'ui_view_document', doc_id=doc_id),
         "error": request.query_params.get("error"), "document": document, "is_edit_mode": True
     }
     return templates.TemplateResponse("document_form.html", {"request": request, "data": context_data})
@@ -338,10 +563,11 @@ async def update_document_web(
              updated_document = await _update_document_in_db(session=db, document_id=doc_id, name=name, path=path, type=type)
              if updated_document is None: error_message = f"Document with ID {doc_id} not found."; logger.warning(f"Update failed: {error_message}"); raise ValueError(error_message)
         logger.info(f"Document {doc_id} metadata updated successfully via web route.")
-    except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Database error updating document: {e}"; logger.error(f"Error updating document {doc_id} via web: {e}", exc_info=True)
+    except ValueError as e: error_message = error_message or str(e); logger.warning(f"Update failed for document {doc_id}: {e}")
+    except SQLAlchemyError as e: error_message = error_message or f"Database error updating document: {e}"; logger.error(f"Error updating document {doc_id} via web: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error updating document {doc_id} via web: {e}", exc_info=True)
-    if updated_document is not None and error_message is None: return RedirectResponse(request.url_for('ui_view_document', doc_id=doc_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error during update.')}"; return RedirectResponse(str(request.url_for('ui_edit_document', doc_id=doc_id)) + error_param, status_code=303)
+    if updated_document is not None and error_message is None: return RedirectResponse(_fast_url_for(request, 'ui_view_document', doc_id=doc_id), status_code=303)
+    else: return _redirect_with_error(_fast_url_for(request, 'ui_edit_document', doc_id=doc_id), error_message or 'Unknown error during update.')
 
 @router.post("/documents/{doc_id}/delete", name="ui_delete_document")
 async def delete_document_web(doc_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
@@ -359,8 +585,8 @@ async def delete_document_web(doc_id: int, request: Request, db: AsyncSession =
         else: logger.warning(f"Document {doc_id} not found for deletion. Assuming success for redirect.")
     except SQLAlchemyError as e: error_message = error_message or f"Database error deleting document {doc_id}: {e}"; logger.error(error_message, exc_info=True)
     except Exception as e: error_message = f"Error deleting document {doc_id}: {e}"; logger.error(error_message, exc_info=True)
-    redirect_url = request.url_for('ui_view_project', project_id=project_id_to_redirect) if project_id_to_redirect else request.url_for('ui_list_projects')
-    if error_message: logger.warning(f"Redirecting after delete failure for doc {doc_id}: {error_message}") # redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _fast_url_for(request, 'ui_view_project', project_id=project_id_to_redirect) if project_id_to_redirect else _fast_url_for(request, 'ui_list_projects')
+    if error_message: logger.warning(f"Redirecting after delete failure for doc {doc_id}: {error_message}")
     return RedirectResponse(redirect_url, status_code=303)
 
 @router.post("/documents/{doc_id}/tags/add", name="ui_add_tag_to_document")
@@ -376,14 +602,14 @@ async def add_tag_to_document_web(
             async with db.begin():
                 success = await _add_tag_to_document_db(session=db, document_id=doc_id, tag_name=tag_name.strip())
                 if not success:
-                    async with AsyncSessionFactory() as check_session: doc = await check_session.get(Document, doc_id)
-                    error_message = f"Document {doc_id} not found." if doc is None else f"Failed to add tag '{tag_name}' (DB error)."
+                    # Tell a missing document from a DB error on the same session, within the same transaction
+                    error_message = f"Document {doc_id} not found." if not await _row_exists(db, Document, doc_id) else f"Failed to add tag '{tag_name}' (DB error)."
                     logger.error(f"{error_message} (_add_tag_to_document_db returned False)"); raise ValueError(error_message)
             logger.info(f"Tag '{tag_name}' added/associated with document {doc_id} via web.")
         except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error adding tag: {e}"; logger.error(f"Error adding tag '{tag_name}' to doc {doc_id} via web: {e}", exc_info=True)
         except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error adding tag '{tag_name}' to doc {doc_id} via web: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_document', doc_id=doc_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _fast_url_for(request, 'ui_view_document', doc_id=doc_id)
+    if error_message: return _redirect_with_error(redirect_url, error_message)
     return RedirectResponse(redirect_url, status_code=303)
 
 @router.post("/documents/{doc_id}/tags/remove", name="ui_remove_tag_from_document")
@@ -402,8 +628,8 @@ async def remove_tag_from_document_web(
             logger.info(f"Tag '{tag_name}' removed/disassociated from document {doc_id} via web.")
         except SQLAlchemyError as e: error_message = error_message or f"Database error removing tag: {e}"; logger.error(f"Error removing tag '{tag_name}' from doc {doc_id} via web: {e}", exc_info=True)
         except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error removing tag '{tag_name}' from doc {doc_id} via web: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_document', doc_id=doc_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _fast_url_for(request, 'ui_view_document', doc_id=doc_id)
+    if error_message: return _redirect_with_error(redirect_url, error_message)
     return RedirectResponse(redirect_url, status_code=303)
 
 @router.get("/versions/{version_id}", response_class=HTMLResponse, name="ui_view_version")
@@ -411,7 +637,6 @@ async def view_document_version_web(version_id: int, request: Request, db: Async
     """Fetches a specific document version and renders its detail page."""
     logger.info(f"Web UI document version detail requested for Version ID: {version_id}")
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
     version = None; error_message = None
     try:
         version = await _get_document_version_content_db(session=db, version_id=version_id)
@@ -421,24 +646,23 @@ async def view_document_version_web(version_id: int, request: Request, db: Async
     except HTTPException: raise
     except Exception as e: error_message = f"Unexpected server error: {e}"; logger.error(f"Unexpected error fetching document version {version_id}: {e}", exc_info=True); raise HTTPException(status_code=500, detail="Unexpected server error.")
     context_data = {"page_title": f"Version {version.version} of Document {version.document.name}" if version and version.document else "Version Not Found", "version": version, "error": error_message}
-    return templates.TemplateResponse("version_detail.html", {"request": request, "data": context_data})
+    return _render(templates, "version_detail.html", {"request": request, "data": context_data})
 
 @router.get("/documents/{doc_id}/new_version", response_class=HTMLResponse, name="ui_new_version_form")
 async def new_document_version_form(doc_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Displays the form to create a new version of a document."""
     logger.info(f"Web UI new version form requested for document ID: {doc_id}")
     templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
     document = await db.get(Document, doc_id)
     if document is None: raise HTTPException(status_code=404, detail=f"Document with ID {doc_id} not found")
     context_data = {
         "page_title": f"Create New Version for '{document.name}'",
-        "form_action": request.url_for('ui_create_version', doc_id=doc_id),
-        "cancel_url": request.url_for('ui_view_document', doc_id=doc_id),
+        "form_action": _fast_url_for(request, 'ui_create_version', doc_id=doc_id),
+        "cancel_url": _fast_url_for(request, 'ui_view_document', doc_id=doc_id),
         "document": document,
         "error": request.query_params.get("error")
     }
-    return templates.TemplateResponse("version_form.html", {"request": request, "data": context_data})
+    return _render(templates, "version_form.html", {"request": request, "data": context_data})
 
 @router.post("/documents/{doc_id}/versions", name="ui_create_version")
 async def create_document_version_web(
@@ -449,7 +673,7 @@ async def create_document_version_web(
     logger.info(f"Web UI create new version submitted for document {doc_id}: version='{version_string}'")
     error_message = None; updated_doc = None; new_version = None
     if not version_string or version_string.isspace(): error_message = "Version string cannot be empty."
-    if error_message: error_param = f"?error={quote_plus(error_message)}"; return RedirectResponse(str(request.url_for('ui_new_version_form', doc_id=doc_id)) + error_param, status_code=303)
+    if error_message: return _redirect_with_error(_fast_url_for(request, 'ui_new_version_form', doc_id=doc_id), error_message)
     try:
         async with db.begin():
             updated_doc, new_version = await _add_document_version_db(session=db, document_id=doc_id, content=content, version_string=version_string.strip())
@@ -458,37 +682,89 @@ async def create_document_version_web(
     except ValueError as ve: error_message = str(ve); logger.warning(f"Validation error creating version for doc {doc_id}: {error_message}", exc_info=False) # Don't need full stack for validation error
     except SQLAlchemyError as e: error_message = f"Database error creating version: {e}"; logger.error(f"Database error creating version for doc {doc_id}: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Unexpected error creating version for doc {doc_id}: {e}", exc_info=True)
-    if updated_doc is not None and new_version is not None and error_message is None: return RedirectResponse(request.url_for('ui_view_document', doc_id=doc_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error creating version.')}"; return RedirectResponse(str(request.url_for('ui_new_version_form', doc_id=doc_id)) + error_param, status_code=303)
+    if updated_doc is not None and new_version is not None and error_message is None: return RedirectResponse(_fast_url_for(request, 'ui_view_document', doc_id=doc_id), status_code=303)
+    else: return _redirect_with_error(_fast_url_for(request, 'ui_new_version_form', doc_id=doc_id), error_message or 'Unknown error creating version.')
 
 
 # --- Memory Entry Routes ---
 @router.get("/memory", response_class=HTMLResponse, name="ui_list_memory_entries_all")
-async def list_all_memory_entries_web(request: Request, db: AsyncSession = Depends(get_db_session)):
-    """Fetches ALL memory entries across projects and renders the list page."""
-    logger.info("Web UI list all memory entries requested")
-    templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    memory_entries = []; error_message = request.query_params.get("error")
+async def list_all_memory_entries_web(
+    request: Request, page: int = Query(1, ge=1), page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db_session), templates: Jinja2Templates = Depends(get_templates)
+):
+    """Fetches one page of memory entries across projects and renders the list page."""
+    logger.info("Web UI list all memory entries requested (page %s, size %s)", page, page_size)
+    memory_entries = []; total = 0; etag = None; error_message = request.query_params.get("error")
     try:
-        stmt = select(MemoryEntry).options(selectinload(MemoryEntry.project)).order_by(MemoryEntry.updated_at.desc())
-        result = await db.execute(stmt)
-        memory_entries = result.scalars().all(); logger.info(f"Found {len(memory_entries)} total memory entries.")
-    except SQLAlchemyError as e: error_message = error_message or f"Database error fetching entries: {e}"; logger.error(f"Database error fetching all memory entries: {e}", exc_info=True)
-    except Exception as e: error_message = error_message or f"Unexpected server error: {e}"; logger.error(f"Unexpected error fetching all memory entries: {e}", exc_info=True)
-    context_data = {"page_title": "All Memory Entries", "memory_entries": memory_entries, "error": error_message}
-    return templates.TemplateResponse("memory_entries_list.html", {"request": request, "data": context_data})
+        total, last_entry_update, last_project_update = (await db.execute(_MEMORY_LIST_SIGNATURE_STMT)).one()
+        etag = _make_etag(total, last_entry_update, last_project_update, page, page_size, error_message)
+        if request.headers.get("if-none-match") == etag:
+            logger.debug("Memory entry list unchanged, returning 304.")
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL})
+        if total:
+            stmt = _LIST_MEMORY_ENTRIES_STMT.limit(page_size).offset((page - 1) * page_size)
+            # Render the page once around a marker, then stream rows from a server-side cursor in between
+            context_data = {"page_title": "All Memory Entries", "memory_entries": [], "rows_marker": ROWS_MARKER, "pagination": _pagination_context(page, page_size, total), "error": error_message}
+            page_html = _get_template(templates, "memory_entries_list.html").render({"request": request, "data": context_data})
+            head, tail = page_html.split(ROWS_MARKER, 1)
+            logger.info("Streaming page %s of %s total memory entries.", page, total)
+            return StreamingResponse(
+                _stream_rows(request, stmt, "_memory_row.html", "entry", head, tail),
+                media_type="text/html", headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+            )
+    except SQLAlchemyError as e: etag = None; error_message = error_message or f"Database error fetching entries: {e}"; logger.error(f"Database error fetching all memory entries: {e}", exc_info=True)
+    except Exception as e: etag = None; error_message = error_message or f"Unexpected server error: {e}"; logger.error(f"Unexpected error fetching all memory entries: {e}", exc_info=True)
+    context_data = {"page_title": "All Memory Entries", "memory_entries": memory_entries, "pagination": _pagination_context(page, page_size, total), "error": error_message}
+    response = templates.TemplateResponse("memory_entries_list.html", {"request": request, "data": context_data})
+    if etag:
+        response.headers["ETag"] = etag; response.headers["Cache-Control"] = LIST_CACHE_CONTROL
+    return response
+
+# Memory detail page: the entry's own columns, then its tags, linked documents and relations as plain
+# column rows (named as the template reads them), so rendering never walks ORM relationships
+_entry_param = bindparam("entry_id", type_=Integer)
+_GET_MEMORY_ENTRY_STMT = select(MemoryEntry).options(raiseload("*")).where(MemoryEntry.id == _entry_param)
+_MEMORY_ENTRY_TAGS_STMT = (
+    select(Tag.name).join(memory_entry_tags_table, memory_entry_tags_table.c.tag_id == Tag.id)
+    .where(memory_entry_tags_table.c.memory_entry_id == _entry_param).order_by(Tag.name)
+)
+_MEMORY_ENTRY_DOCUMENTS_STMT = (
+    select(Document.id, Document.name)
+    .join(memory_entry_document_relations_table, memory_entry_document_relations_table.c.document_id == Document.id)
+    .where(memory_entry_document_relations_table.c.memory_entry_id == _entry_param).order_by(Document.id)
+)
+# Outer joins keep relations whose other end is gone (FKs are not enforced under aiosqlite), shown as "N/A"
+_RELATIONS_FROM_STMT = (
+    select(
+        MemoryEntryRelation.id.label("relation_id"), MemoryEntryRelation.relation_type.label("type"),
+        MemoryEntryRelation.target_memory_entry_id.label("target_id"), func.coalesce(MemoryEntry.title, "N/A").label("target_title")
+    )
+    .outerjoin(MemoryEntry, MemoryEntry.id == MemoryEntryRelation.target_memory_entry_id)
+    .where(MemoryEntryRelation.source_memory_entry_id == _entry_param).order_by(MemoryEntryRelation.id)
+)
+_RELATIONS_TO_STMT = (
+    select(
+        MemoryEntryRelation.id.label("relation_id"), MemoryEntryRelation.relation_type.label("type"),
+        MemoryEntryRelation.source_memory_entry_id.label("source_id"), func.coalesce(MemoryEntry.title, "N/A").label("source_title")
+    )
+    .outerjoin(MemoryEntry, MemoryEntry.id == MemoryEntryRelation.source_memory_entry_id)
+    .where(MemoryEntryRelation.target_memory_entry_id == _entry_param).order_by(MemoryEntryRelation.id)
+)
+
+async def _execute_in_order(session: AsyncSession, statements: tuple, params: Dict[str, Any]) -> list:
+    """Runs statements one after another on one session (a session cannot run two queries at once)."""
+    return [await session.execute(stmt, params) for stmt in statements]
 
 # Replace existing view_memory_entry_web function
 @router.get("/memory/{entry_id}", response_class=HTMLResponse, name="ui_view_memory_entry")
 async def view_memory_entry_web(
-    entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session)
+    entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session),
+    documents_db: AsyncSession = Depends(get_db_session, use_cache=False), # Extra sessions so the link-candidate queries
+    memory_db: AsyncSession = Depends(get_db_session, use_cache=False),    # overlap the entry load
+    templates: Jinja2Templates = Depends(get_templates)
 ):
     """Fetches a specific memory entry, its relationships, and available linkable items."""
-    logger.info(f"Web UI memory entry detail requested for ID: {entry_id}")
-    templates = request.app.state.templates
-    if not templates:
-        raise HTTPException(status_code=500, detail="Server configuration error")
+    logger.info("Web UI memory entry detail requested for ID: %s", entry_id)
 
     error_message = request.query_params.get("error")
     entry = None
@@ -496,29 +772,22 @@ async def view_memory_entry_web(
     available_memory_entries = [] # Initialize available memory entries list
 
     try:
-        entry = await _get_memory_entry_db(session=db, entry_id=entry_id)
+        # None of these queries needs another's result (the link candidates resolve the entry's project
+        # in SQL), so they are spread over three sessions whose round trips overlap
+        params = {"entry_id": entry_id}
+        (entry_result, tag_results, doc_link_results), (doc_results, from_results), (mem_results, to_results) = await asyncio.gather(
+            _execute_in_order(db, (_GET_MEMORY_ENTRY_STMT, _MEMORY_ENTRY_TAGS_STMT, _MEMORY_ENTRY_DOCUMENTS_STMT), params),
+            _execute_in_order(documents_db, (_LINKABLE_DOCUMENTS_STMT, _RELATIONS_FROM_STMT), params),
+            _execute_in_order(memory_db, (_LINKABLE_MEMORY_ENTRIES_STMT, _RELATIONS_TO_STMT), params)
+        )
+        entry = entry_result.scalar_one_or_none()
         if entry is None:
             error_message = f"Memory Entry with ID {entry_id} not found."
             raise HTTPException(status_code=404, detail=error_message)
-        logger.info(f"Found memory entry '{entry.title}' (ID: {entry_id})")
-
-        # --- Query for available documents and memory entries in the same project ---
-        if entry.project_id:
-            # Documents
-            doc_stmt = select(Document).where(Document.project_id == entry.project_id).order_by(Document.name)
-            doc_results = await db.execute(doc_stmt)
-            available_documents = doc_results.scalars().all()
-            logger.debug(f"Found {len(available_documents)} documents in project {entry.project_id} for potential linking.")
-
-            # --- ADDED: Query for other memory entries ---
-            mem_stmt = select(MemoryEntry).where(
-                MemoryEntry.project_id == entry.project_id,
-                MemoryEntry.id != entry_id # Exclude the current entry
-            ).order_by(MemoryEntry.title)
-            mem_results = await db.execute(mem_stmt)
-            available_memory_entries = mem_results.scalars().all()
-            logger.debug(f"Found {len(available_memory_entries)} other memory entries in project {entry.project_id} for potential linking.")
-            # --- END ADDED ---
+        logger.info("Found memory entry '%s' (ID: %s)", entry.title, entry_id)
+        available_documents = doc_results.scalars().all()
+        available_memory_entries = mem_results.scalars().all()
+        logger.debug("Found %s documents and %s other memory entries in project %s for potential linking.", len(available_documents), len(available_memory_entries), entry.project_id)
 
     except SQLAlchemyError as e:
         logger.error(f"Database error fetching memory entry {entry_id} or related data: {e}", exc_info=True)
@@ -531,13 +800,11 @@ async def view_memory_entry_web(
          error_message = error_message or f"Unexpected server error: {e}"
          raise HTTPException(status_code=500, detail=error_message)
 
-    # Format related data (keep existing formatting)
-    tags = sorted([tag.name for tag in entry.tags]) if entry.tags else []
-    linked_docs = [{"id": doc.id, "name": doc.name} for doc in entry.documents] if entry.documents else []
-    # Ensure titles are present or default for relations display
-    relations_from = [{"relation_id": rel.id, "type": rel.relation_type, "target_id": rel.target_memory_entry_id, "target_title": rel.target_entry.title if rel.target_entry else "N/A"} for rel in entry.source_relations] if entry.source_relations else []
-    relations_to = [{"relation_id": rel.id, "type": rel.relation_type, "source_id": rel.source_memory_entry_id, "source_title": rel.source_entry.title if rel.source_entry else "N/A"} for rel in entry.target_relations] if entry.target_relations else []
-
+    # Rows already come sorted and shaped for the template
+    tags = tag_results.scalars().all()
+    linked_docs = doc_link_results.all()
+    relations_from = from_results.all()
+    relations_to = to_results.all()
 
     context_data = {
         "page_title": f"Memory Entry: {entry.title}",
@@ -550,24 +817,23 @@ async def view_memory_entry_web(
         "available_memory_entries": available_memory_entries, # --- ADDED: Pass available entries ---
         "error": error_message
     }
-    return templates.TemplateResponse(
-        "memory_detail.html",
-        {"request": request, "data": context_data}
-    )
+    return _render(templates, "memory_detail.html", {"request": request, "data": context_data})
 
 @router.get("/projects/{project_id}/memory/new", response_class=HTMLResponse, name="ui_new_memory_entry")
-async def new_memory_entry_form(project_id: int, request: Request):
+async def new_memory_entry_form(project_id: int, request: Request, templates: Jinja2Templates = Depends(get_templates)):
     """Displays the form to create a new memory entry."""
-    logger.info(f"Web UI new memory entry form requested for project ID: {project_id}")
-    templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    context_data = {
-        "page_title": "Add New Memory Entry",
-        "form_action": request.url_for('ui_create_memory_entry', project_id=project_id),
-        "cancel_url": request.url_for('ui_view_project', project_id=project_id),
-        "project_id": project_id, "error": request.query_params.get("error")
-    }
-    return templates.TemplateResponse("memory_form.html", {"request": request, "data": context_data})
+    logger.info("Web UI new memory entry form requested for project ID: %s", project_id)
+    error_message = request.query_params.get("error")
+    def build_context() -> Dict[str, Any]:
+        return {
+            "page_title": "Add New Memory Entry",
+            "form_action": _fast_url_for(request, 'ui_create_memory_entry', project_id=project_id),
+            "cancel_url": _fast_url_for(request, 'ui_view_project', project_id=project_id),
+            "project_id": project_id, "error": error_message
+        }
+    # The error-free form only varies by project_id, so serve it from the rendered HTML cache
+    if not error_message: return _render_cached(request, "memory_form.html", (project_id,), build_context)
+    return _render(templates, "memory_form.html", {"request": request, "data": build_context()})
 
 @router.post("/projects/{project_id}/memory", name="ui_create_memory_entry")
 async def create_memory_entry_web(
@@ -575,36 +841,35 @@ async def create_memory_entry_web(
     title: str = Form(...), type: str = Form(...), content: str = Form(...)
 ):
     """Handles submission of the new memory entry form."""
-    logger.info(f"Web UI create memory entry submitted for project {project_id}: title='{title}'")
+    logger.info("Web UI create memory entry submitted for project %s: title='%s'", project_id, title)
     error_message = None; new_entry = None; new_entry_id = None
     try:
-        async with db.begin():
-            new_entry = await _add_memory_entry_db(session=db, project_id=project_id, title=title, type=type, content=content)
-            if new_entry is None:
-                async with AsyncSessionFactory() as check_session: project = await check_session.get(Project, project_id)
-                error_message = f"Project with ID {project_id} not found." if project is None else "Database error adding memory entry."
-                raise ValueError(error_message)
-        new_entry_id = new_entry.id; logger.info(f"Memory entry created via web route, ID: {new_entry_id}")
-    except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error adding memory entry: {e}"; logger.error(f"Error in create_memory_entry_web for project {project_id}: {e}", exc_info=True)
-    except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error in create_memory_entry_web for project {project_id}: {e}", exc_info=True)
-    if new_entry_id is not None: return RedirectResponse(request.url_for('ui_view_memory_entry', entry_id=new_entry_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error adding memory entry.')}"; return RedirectResponse(str(request.url_for('ui_new_memory_entry', project_id=project_id)) + error_param, status_code=303)
+        # Single INSERT: rely on the session's implicit transaction and commit directly
+        new_entry = await _add_memory_entry_db(session=db, project_id=project_id, title=title, type=type, content=content)
+        # None means only "project missing"; database errors raise out of the helper
+        if new_entry is None: error_message = f"Project with ID {project_id} not found."; raise ValueError(error_message)
+        await db.commit()
+        new_entry_id = new_entry.id; logger.info("Memory entry created via web route, ID: %s", new_entry_id)
+    except (SQLAlchemyError, ValueError) as e: await db.rollback(); error_message = error_message or f"Error adding memory entry: {e}"; logger.error(f"Error in create_memory_entry_web for project {project_id}: {e}", exc_info=True)
+    except Exception as e: await db.rollback(); error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error in create_memory_entry_web for project {project_id}: {e}", exc_info=True)
+    if new_entry_id is not None: return RedirectResponse(_view_memory_url(request, new_entry_id), status_code=303)
+    else: return _redirect_with_error(_fast_url_for(request, 'ui_new_memory_entry', project_id=project_id), error_message or 'Unknown error adding memory entry.')
 
 @router.get("/memory/{entry_id}/edit", response_class=HTMLResponse, name="ui_edit_memory_entry")
-async def edit_memory_entry_form(entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
+async def edit_memory_entry_form(
+    entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session), templates: Jinja2Templates = Depends(get_templates)
+):
     """Displays the form pre-filled for editing an existing memory entry."""
-    logger.info(f"Web UI edit memory entry form requested for ID: {entry_id}")
-    templates = request.app.state.templates
-    if not templates: raise HTTPException(status_code=500, detail="Server configuration error")
-    entry = await db.get(MemoryEntry, entry_id)
+    logger.info("Web UI edit memory entry form requested for ID: %s", entry_id)
+    entry = (await db.execute(_GET_MEMORY_ENTRY_FORM_STMT, {"entry_id": entry_id})).scalar_one_or_none()
     if entry is None: raise HTTPException(status_code=404, detail=f"Memory Entry with ID {entry_id} not found")
     context_data = {
         "page_title": f"Edit Memory Entry: {entry.title}",
-        "form_action": request.url_for('ui_update_memory_entry', entry_id=entry_id),
-        "cancel_url": request.url_for('ui_view_memory_entry', entry_id=entry_id),
+        "form_action": _fast_url_for(request, 'ui_update_memory_entry', entry_id=entry_id),
+        "cancel_url": _view_memory_url(request, entry_id),
         "error": request.query_params.get("error"), "entry": entry, "is_edit_mode": True
     }
-    return templates.TemplateResponse("memory_form.html", {"request": request, "data": context_data})
+    return _render(templates, "memory_form.html", {"request": request, "data": context_data})
 
 @router.post("/memory/{entry_id}/edit", name="ui_update_memory_entry")
 async def update_memory_entry_web(
@@ -612,22 +877,22 @@ async def update_memory_entry_web(
     title: str = Form(...), type: str = Form(...), content: str = Form(...)
 ):
     """Handles submission of the edit memory entry form."""
-    logger.info(f"Web UI update memory entry submitted for ID: {entry_id}")
+    logger.info("Web UI update memory entry submitted for ID: %s", entry_id)
     error_message = None; updated_entry = None
     try:
-        async with db.begin():
-            updated_entry = await _update_memory_entry_db(session=db, entry_id=entry_id, title=title, type=type, content=content)
-            if updated_entry is None: error_message = f"Memory Entry with ID {entry_id} not found."; logger.warning(f"Update failed: {error_message}"); raise ValueError(error_message)
-        logger.info(f"Memory entry {entry_id} updated successfully via web route.")
-    except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Database error updating memory entry: {e}"; logger.error(f"Error updating memory entry {entry_id} via web: {e}", exc_info=True)
-    except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error updating memory entry {entry_id} via web: {e}", exc_info=True)
-    if updated_entry is not None and error_message is None: return RedirectResponse(request.url_for('ui_view_memory_entry', entry_id=entry_id), status_code=303)
-    else: error_param = f"?error={quote_plus(error_message or 'Unknown error during update.')}"; return RedirectResponse(str(request.url_for('ui_edit_memory_entry', entry_id=entry_id)) + error_param, status_code=303)
+        updated_entry = await _update_memory_entry_db(session=db, entry_id=entry_id, title=title, type=type, content=content)
+        if updated_entry is None: error_message = f"Memory Entry with ID {entry_id} not found."; logger.warning("Update failed: %s", error_message); raise ValueError(error_message)
+        await db.commit()
+        logger.info("Memory entry %s updated successfully via web route.", entry_id)
+    except (SQLAlchemyError, ValueError) as e: await db.rollback(); error_message = error_message or f"Database error updating memory entry: {e}"; logger.error(f"Error updating memory entry {entry_id} via web: {e}", exc_info=True)
+    except Exception as e: await db.rollback(); error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error updating memory entry {entry_id} via web: {e}", exc_info=True)
+    if updated_entry is not None and error_message is None: return RedirectResponse(_view_memory_url(request, entry_id), status_code=303)
+    else: return _redirect_with_error(_fast_url_for(request, 'ui_edit_memory_entry', entry_id=entry_id), error_message or 'Unknown error during update.')
 
 @router.post("/memory/{entry_id}/delete", name="ui_delete_memory_entry")
 async def delete_memory_entry_web(entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session)):
     """Handles deletion of a memory entry."""
-    logger.info(f"Web UI delete memory entry request for ID: {entry_id}")
+    logger.info("Web UI delete memory entry request for ID: %s", entry_id)
     error_message = None; project_id_to_redirect = None
     try:
         async with db.begin():
@@ -636,11 +901,11 @@ async def delete_memory_entry_web(entry_id: int, request: Request, db: AsyncSess
             if not deleted:
                 error_message = f"Memory Entry {entry_id} not found." if project_id is None else f"Database error deleting memory entry {entry_id}."
                 logger.error(f"Deletion failed: {error_message}"); raise SQLAlchemyError(error_message)
-        logger.info(f"Memory entry {entry_id} deleted successfully via web route.")
+        logger.info("Memory entry %s deleted successfully via web route.", entry_id)
     except SQLAlchemyError as e: error_message = error_message or f"Database error during deletion: {e}"; logger.error(error_message, exc_info=True)
     except Exception as e: error_message = f"Error deleting memory entry {entry_id}: {e}"; logger.error(error_message, exc_info=True)
-    redirect_url = request.url_for('ui_view_project', project_id=project_id_to_redirect) if project_id_to_redirect else request.url_for('ui_list_projects')
-    if error_message: logger.warning(f"Redirecting after delete failure for memory entry {entry_id}: {error_message}") # redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _fast_url_for(request, 'ui_view_project', project_id=project_id_to_redirect) if project_id_to_redirect else _fast_url_for(request, 'ui_list_projects')
+    if error_message: logger.warning("Redirecting after delete failure for memory entry %s: %s", entry_id, error_message)
     return RedirectResponse(redirect_url, status_code=303)
 
 @router.post("/memory/{entry_id}/tags/add", name="ui_add_tag_to_memory_entry")
@@ -648,43 +913,41 @@ async def add_tag_to_memory_entry_web(
     entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session), tag_name: str = Form(...)
 ):
     """Handles adding a tag to a memory entry."""
-    logger.info(f"Web UI add tag '{tag_name}' request for memory entry ID: {entry_id}")
+    logger.info("Web UI add tag '%s' request for memory entry ID: %s", tag_name, entry_id)
     error_message = None
     if not tag_name or tag_name.isspace(): error_message = "Tag name cannot be empty."
     else:
         try:
-            async with db.begin():
-                success = await _add_tag_to_memory_entry_db(session=db, entry_id=entry_id, tag_name=tag_name.strip())
-                if not success:
-                    async with AsyncSessionFactory() as check_session: entry = await check_session.get(MemoryEntry, entry_id)
-                    error_message = f"Memory Entry {entry_id} not found." if entry is None else f"Failed to add tag '{tag_name}' (DB error)."
-                    logger.error(f"{error_message} (_add_tag_to_memory_entry_db returned False)"); raise ValueError(error_message)
-            logger.info(f"Tag '{tag_name}' added/associated with memory entry {entry_id} via web.")
-        except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error adding tag: {e}"; logger.error(f"Error adding tag '{tag_name}' to memory {entry_id} via web: {e}", exc_info=True)
-        except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error adding tag '{tag_name}' to memory {entry_id} via web: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_memory_entry', entry_id=entry_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
-    return RedirectResponse(redirect_url, status_code=303)
+            success = await _add_tag_to_memory_entry_db(session=db, entry_id=entry_id, tag_name=tag_name.strip())
+            if not success:
+                entry_exists = await _row_exists(db, MemoryEntry, entry_id)
+                error_message = f"Memory Entry {entry_id} not found." if not entry_exists else f"Failed to add tag '{tag_name}' (DB error)."
+                logger.error(f"{error_message} (_add_tag_to_memory_entry_db returned False)"); raise ValueError(error_message)
+            await db.commit()
+            logger.info("Tag '%s' added/associated with memory entry %s via web.", tag_name, entry_id)
+        except (SQLAlchemyError, ValueError) as e: await db.rollback(); error_message = error_message or f"Error adding tag: {e}"; logger.error(f"Error adding tag '{tag_name}' to memory {entry_id} via web: {e}", exc_info=True)
+        except Exception as e: await db.rollback(); error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error adding tag '{tag_name}' to memory {entry_id} via web: {e}", exc_info=True)
+    if error_message: return _redirect_with_error(_view_memory_url(request, entry_id), error_message)
+    return RedirectResponse(_view_memory_url(request, entry_id), status_code=303)
 
 @router.post("/memory/{entry_id}/tags/remove", name="ui_remove_tag_from_memory_entry")
 async def remove_tag_from_memory_entry_web(
     entry_id: int, request: Request, db: AsyncSession = Depends(get_db_session), tag_name: str = Form(...)
 ):
     """Handles removing a tag from a memory entry."""
-    logger.info(f"Web UI remove tag '{tag_name}' request for memory entry ID: {entry_id}")
+    logger.info("Web UI remove tag '%s' request for memory entry ID: %s", tag_name, entry_id)
     error_message = None
     if not tag_name: error_message = "Tag name not provided for removal."
     else:
         try:
-            async with db.begin():
-                success = await _remove_tag_from_memory_entry_db(session=db, entry_id=entry_id, tag_name=tag_name)
-                if not success: error_message = f"Failed to remove tag '{tag_name}' due to database error."; raise SQLAlchemyError(error_message)
-            logger.info(f"Tag '{tag_name}' removed/disassociated from memory entry {entry_id} via web.")
-        except SQLAlchemyError as e: error_message = error_message or f"Database error removing tag: {e}"; logger.error(f"Error removing tag '{tag_name}' from memory {entry_id} via web: {e}", exc_info=True)
-        except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error removing tag '{tag_name}' from memory {entry_id} via web: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_memory_entry', entry_id=entry_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
-    return RedirectResponse(redirect_url, status_code=303)
+            success = await _remove_tag_from_memory_entry_db(session=db, entry_id=entry_id, tag_name=tag_name)
+            if not success: error_message = f"Failed to remove tag '{tag_name}' due to database error."; raise SQLAlchemyError(error_message)
+            await db.commit()
+            logger.info("Tag '%s' removed/disassociated from memory entry %s via web.", tag_name, entry_id)
+        except SQLAlchemyError as e: await db.rollback(); error_message = error_message or f"Database error removing tag: {e}"; logger.error(f"Error removing tag '{tag_name}' from memory {entry_id} via web: {e}", exc_info=True)
+        except Exception as e: await db.rollback(); error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error removing tag '{tag_name}' from memory {entry_id} via web: {e}", exc_info=True)
+    if error_message: return _redirect_with_error(_view_memory_url(request, entry_id), error_message)
+    return RedirectResponse(_view_memory_url(request, entry_id), status_code=303)
 
 # --- START: Memory-Document Linking Routes (Phase 6) ---
 @router.post("/memory/{entry_id}/links/documents", name="ui_link_memory_to_document")
@@ -693,21 +956,19 @@ async def link_memory_to_document_web(
     document_id: int = Form(...) # Get document ID from form select
 ):
     """Handles linking a selected document to a memory entry."""
-    logger.info(f"Web UI: Linking document {document_id} to memory entry {entry_id}")
+    logger.info("Web UI: Linking document %s to memory entry %s", document_id, entry_id)
     error_message = None; message = None
     try:
         async with db.begin():
-             mem_entry = await db.get(MemoryEntry, entry_id, options=[selectinload(MemoryEntry.documents)])
-             doc_to_link = await db.get(Document, document_id)
-             if not mem_entry: error_message = f"Memory Entry {entry_id} not found."
-             elif not doc_to_link: error_message = f"Document {document_id} not found."
-             elif doc_to_link in mem_entry.documents: message = "Document already linked."
-             else: mem_entry.documents.append(doc_to_link); await db.flush(); message = f"Document '{doc_to_link.name}' linked successfully."; logger.info(message)
+             linked = await _link_memory_to_document_db(db, entry_id, document_id)
+             if linked is None: error_message = f"Memory Entry {entry_id} not found." if not await _row_exists(db, MemoryEntry, entry_id) else f"Document {document_id} not found."
+             elif not linked: message = "Document already linked."
+             else: message = f"Document {document_id} linked successfully."; logger.info(message)
              if error_message: raise ValueError(error_message)
     except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error linking document: {e}"; logger.error(f"Error linking doc {document_id} to memory {entry_id}: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error linking doc {document_id} to memory {entry_id}: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_memory_entry', entry_id=entry_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _view_memory_url(request, entry_id)
+    if error_message: return _redirect_with_error(redirect_url, error_message)
     # elif message and message != "Document already linked.": # Optional success flash
     return RedirectResponse(redirect_url, status_code=303)
 
@@ -716,21 +977,20 @@ async def unlink_memory_from_document_web(
     entry_id: int, doc_id: int, request: Request, db: AsyncSession = Depends(get_db_session)
 ):
     """Handles unlinking a document from a memory entry."""
-    logger.info(f"Web UI: Unlinking document {doc_id} from memory entry {entry_id}")
+    logger.info("Web UI: Unlinking document %s from memory entry %s", doc_id, entry_id)
     error_message = None; message = None
     try:
         async with db.begin():
-             mem_entry = await db.get(MemoryEntry, entry_id, options=[selectinload(MemoryEntry.documents)])
-             doc_to_unlink = await db.get(Document, doc_id)
-             if not mem_entry: error_message = f"Memory Entry {entry_id} not found."
-             elif not doc_to_unlink: error_message = f"Document {doc_id} not found (cannot unlink)."
-             elif doc_to_unlink not in mem_entry.documents: message = "Link not found."
-             else: mem_entry.documents.remove(doc_to_unlink); await db.flush(); message = f"Document '{doc_to_unlink.name}' unlinked successfully."; logger.info(message)
+             if await _unlink_memory_from_document_db(db, entry_id, doc_id): message = f"Document {doc_id} unlinked successfully."; logger.info(message)
+             # Nothing deleted: only probe the endpoints to report which one is missing
+             elif not await _row_exists(db, MemoryEntry, entry_id): error_message = f"Memory Entry {entry_id} not found."
+             elif not await _row_exists(db, Document, doc_id): error_message = f"Document {doc_id} not found (cannot unlink)."
+             else: message = "Link not found."
              if error_message: raise ValueError(error_message)
     except (SQLAlchemyError, ValueError) as e: error_message = error_message or f"Error unlinking document: {e}"; logger.error(f"Error unlinking doc {doc_id} from memory {entry_id}: {e}", exc_info=True)
     except Exception as e: error_message = f"An unexpected error occurred: {e}"; logger.error(f"Error unlinking doc {doc_id} from memory {entry_id}: {e}", exc_info=True)
-    redirect_url = request.url_for('ui_view_memory_entry', entry_id=entry_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
+    redirect_url = _view_memory_url(request, entry_id)
+    if error_message: return _redirect_with_error(redirect_url, error_message)
     # elif message and message != "Link not found.": # Optional success flash
     return RedirectResponse(redirect_url, status_code=303)
 # --- END: Memory-Document Linking Routes (Phase 6) ---
@@ -744,45 +1004,44 @@ async def link_memory_to_memory_web(
     relation_type: Optional[str] = Form(None)
 ):
     """Handles linking another memory entry to the current one."""
-    logger.info(f"Web UI: Linking memory entry {target_entry_id} to {entry_id} (type: {relation_type})")
+    logger.info("Web UI: Linking memory entry %s to %s (type: %s)", target_entry_id, entry_id, relation_type)
     error_message = None; message = None
 
-    if entry_id == target_entry_id:
-            error_message = "Cannot link an entry to itself."
-    else:
-        try:
-            async with db.begin():
-                # Ideally call helper: from .mcp_server_instance import link_memory_entries
-                # Re-implementing logic temporarily
-                source_entry = await db.get(MemoryEntry, entry_id)
-                target_entry = await db.get(MemoryEntry, target_entry_id)
-
-                if not source_entry: error_message = f"Source Memory Entry {entry_id} not found."
-                elif not target_entry: error_message = f"Target Memory Entry {target_entry_id} not found."
-                else:
-                    # Check if relation already exists (optional)
-                    # stmt_exists = select(MemoryEntryRelation).where(...) etc.
-                    new_relation = MemoryEntryRelation(
-                        source_memory_entry_id=entry_id,
-                        target_memory_entry_id=target_entry_id,
-                        relation_type=relation_type if relation_type else None # Ensure None not ""
-                    )
-                    db.add(new_relation)
-                    await db.flush()
-                    message = f"Linked entry {target_entry_id} to {entry_id}."
-                    logger.info(message)
-
-                if error_message: raise ValueError(error_message)
-
-        except (SQLAlchemyError, ValueError) as e:
-                if not error_message: error_message = f"Error linking memory entries: {e}"
-                logger.error(f"Error linking memory {target_entry_id} to {entry_id}: {e}", exc_info=True)
-        except Exception as e:
-            error_message = f"An unexpected error occurred: {e}"
-            logger.error(f"Error linking memory {target_entry_id} to {entry_id}: {e}", exc_info=True)
-
-    redirect_url = request.url_for('ui_view_memory_entry', entry_id=entry_id)
-    if error_message: redirect_url += f"?error={quote_plus(error_message)}"
+    # Pure validation error: redirect before any transaction is opened
+    if entry_id == target_entry_id: return _redirect_with_error(_view_memory_url(request, entry_id), "Cannot link an entry to itself.")
+
+    try:
+        async with db.begin():
+            # Ideally call helper: from .mcp_server_instance import link_memory_entries
+            # Re-implementing logic temporarily
+            # Both endpoints in one round trip; only ids come back, no entries are loaded
+            found_ids = set((await db.execute(select(MemoryEntry.id).where(MemoryEntry.id.in_((entry_id, target_entry_id))))).scalars())
+
+            if entry_id not in found_ids: error_message = f"Source Memory Entry {entry_id} not found."
+            elif target_entry_id not in found_ids: error_message = f"Target Memory Entry {target_entry_id} not found."
+            else:
+                # Check if relation already exists (optional)
+                # stmt_exists = select(MemoryEntryRelation).where(...) etc.
+                new_relation = MemoryEntryRelation(
+                    source_memory_entry_id=entry_id,
+                    target_memory_entry_id=target_entry_id,
+                    relation_type=relation_type if relation_type else None # Ensure None not ""
+                )
+                db.add(new_relation) # Flushed by the commit at the end of db.begin()
+                message = f"Linked entry {target_entry_id} to {entry_id}."
+                logger.info(message)
+
+            if error_message: raise ValueError(error_message)
+
+    except (SQLAlchemyError, ValueError) as e:
+        if not error_message: error_message = f"Error linking memory entries: {e}"
+        logger.error(f"Error linking memory {target_entry_id} to {entry_id}: {e}", exc_info=True)
+    except Exception as e:
+        error_message = f"An unexpected error occurred: {e}"
+        logger.error(f"Error linking memory {target_entry_id} to {entry_id}: {e}", exc_info=True)
+
+    redirect_url = _view_memory_url(request, entry_id)
+    if error_message: return _redirect_with_error(redirect_url, error_message)
     # elif message: # Optional success flash
     return RedirectResponse(redirect_url, status_code=303)
 
@@ -792,7 +1051,7 @@ async def unlink_memory_relation_web(
     relation_id: int, request: Request, db: AsyncSession = Depends(get_db_session)
 ):
     """Handles unlinking two memory entries via the relation ID."""
-    logger.info(f"Web UI: Unlinking memory relation ID: {relation_id}")
+    logger.info("Web UI: Unlinking memory relation ID: %s", relation_id)
     error_message = None; message = None
     # Determine where to redirect: back to the source entry of the relation
     source_entry_id = None
@@ -800,38 +1059,71 @@ async def unlink_memory_relation_web(
 
     try:
         async with db.begin():
-            # Fetch relation first to get source ID for redirect
-            relation = await db.get(MemoryEntryRelation, relation_id)
-            if relation:
-                source_entry_id = relation.source_memory_entry_id
-                logger.info(f"Deleting relation ID: {relation.id} (linking {relation.source_memory_entry_id} -> {relation.target_memory_entry_id})")
-                await db.delete(relation)
-                await db.flush()
+            # Delete and learn the source ID for the redirect in one statement
+            row = (await db.execute(
+                delete(MemoryEntryRelation).where(MemoryEntryRelation.id == relation_id)
+                .returning(MemoryEntryRelation.source_memory_entry_id, MemoryEntryRelation.target_memory_entry_id)
+                .execution_options(synchronize_session=False) # No relation objects are loaded in this session
+            )).first()
+            if row:
+                source_entry_id = row[0]
+                logger.info("Deleted relation ID: %s (linking %s -> %s)", relation_id, row[0], row[1])
                 message = "Memory relation unlinked successfully."
             else:
                 # Relation already gone? Treat as success for user.
                 message = "Relation not found (already unlinked?)."
-                logger.warning(f"Relation ID {relation_id} not found for unlinking.")
+                logger.warning("Relation ID %s not found for unlinking (already unlinked?).", relation_id)
                 redirect_to_memory_list = True # Cant determine source entry
 
     except SQLAlchemyError as e:
             error_message = f"Database error unlinking relation: {e}"
-            logger.error(f"Error unlinking memory relation {relation_id}: {e}", exc_info=True)
+            logger.exception("Error unlinking memory relation %s", relation_id)
             # Try to fetch source_entry_id even on error for redirect? Risky. Fallback to list.
             redirect_to_memory_list = True
-    except Exception as e:
-        error_message = f"An unexpected error occurred: {e}"
-        logger.error(f"Error unlinking memory relation {relation_id}: {e}", exc_info=True)
-        redirect_to_memory_list = True
+    # Anything else is a bug, not a user-facing condition: let it reach Starlette's 500 handler
 
     # Redirect back to source memory entry page if known, otherwise list page
     if source_entry_id and not redirect_to_memory_list:
-            redirect_url = request.url_for('ui_view_memory_entry', entry_id=source_entry_id)
+            redirect_url = _view_memory_url(request, source_entry_id)
     else:
-            redirect_url = request.url_for('ui_list_memory_entries_all') # Fallback
+            redirect_url = _fast_url_for(request, 'ui_list_memory_entries_all') # Fallback
 
     if error_message:
-        redirect_url += f"?error={quote_plus(error_message)}"
+        return _redirect_with_error(redirect_url, error_message)
     # elif message and "successfully" in message: # Optional success flash
     return RedirectResponse(redirect_url, status_code=303)
+
+
+# One DELETE for any number of relations; the expanding bindparam becomes an IN list of the given ids
+_UNLINK_RELATIONS_STMT = (
+    delete(MemoryEntryRelation).where(MemoryEntryRelation.id.in_(bindparam("relation_ids", expanding=True)))
+    .returning(MemoryEntryRelation.source_memory_entry_id)
+    .execution_options(synchronize_session=False)
+)
+
+@router.post("/memory/relations/unlink_bulk", name="ui_unlink_memory_relations_bulk")
+async def unlink_memory_relations_bulk_web(
+    request: Request, db: AsyncSession = Depends(get_db_session), relation_ids: str = Form(...)
+):
+    """Handles unlinking several memory relations at once; relation_ids is a comma-separated list of IDs."""
+    logger.info("Web UI: Bulk unlinking memory relations: %s", relation_ids)
+    list_url = _fast_url_for(request, 'ui_list_memory_entries_all')
+    try:
+        ids = list({int(part) for part in relation_ids.split(",") if part.strip()})
+    except ValueError:
+        return _redirect_with_error(list_url, f"Invalid relation IDs: {relation_ids}")
+    if not ids: return _redirect_with_error(list_url, "No relation IDs given.")
+
+    try:
+        async with db.begin():
+            deleted_sources = (await db.execute(_UNLINK_RELATIONS_STMT, {"relation_ids": ids})).scalars().all()
+    except SQLAlchemyError as e:
+        logger.exception("Error bulk unlinking memory relations %s", ids)
+        return _redirect_with_error(list_url, f"Database error unlinking relations: {e}")
+    logger.info("Deleted %s of %s requested relations.", len(deleted_sources), len(ids))
+    source_ids = set(deleted_sources)
+
+    # Back to the source entry when every deleted relation came from the same one, otherwise the list page
+    if len(source_ids) == 1: return RedirectResponse(_view_memory_url(request, source_ids.pop()), status_code=303)
+    return RedirectResponse(list_url, status_code=303)
 # --- END ADDED for Phase 6 ---